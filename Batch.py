@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import *
+import Cache
+import Checkpoint
+import Export
+import Instrument
+import Seeds
+import Stream
+from Walker import Walker
+from World import World
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    :return: The parser of the options of 'python main.py run'
+    """
+    parser = argparse.ArgumentParser(prog='main.py run',
+                                     description='Run a walker and its copies without the GUI, and save the results.')
+    parser.add_argument('--type', type=int, choices=[1, 2, 3, 4], help='the type of the walker (1 by default)')
+    parser.add_argument('--chances', type=float, nargs=5, metavar=('UP', 'DOWN', 'LEFT', 'RIGHT', 'CENTER'),
+                        help='the chances of a type 4 walker, as fractions or percentages')
+    parser.add_argument('--steps', type=float, default=1000, help='the number of steps, e.g. 1e6')
+    parser.add_argument('--copies', type=float, default=1, help='the number of walkers averaged, including the walker')
+    parser.add_argument('--seed', default=None, help='the seed, the same as the GUI\'s (random by default)')
+    parser.add_argument('--name', help='the name of the walker, which its seed depends on (Walker by default)')
+    parser.add_argument('--scene', help='a JSON file of walls and portals, as written by World.to_dict')
+    parser.add_argument('--out', help='where to save the results')
+    parser.add_argument('--format', choices=['npz', 'columns'], default='npz',
+                        help='a compressed NPZ file, or a directory of chunked columns')
+    parser.add_argument('--storage', choices=['list', 'compact', 'disk'],
+                        help='how the walker\'s statistics are kept while it walks (compact by default, or as '
+                             'saved in the checkpoint with --resume)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='the number of processes simulating the copies')
+    parser.add_argument('--cache-dir', help='a directory to cache the statistics of the copies in')
+    parser.add_argument('--positions', help='also write the position after every step to this file as it walks, '
+                                            'as raw float64 (x, y) rows (see Stream.load_positions); with '
+                                            '--resume the positions written before the checkpoint are kept')
+    parser.add_argument('--checkpoint', help='save the whole simulation to this file now and then, to resume it '
+                                             'with --resume if the run is interrupted; the copies are saved as '
+                                             'their blocks finish, and count as steps, so --cache-dir is not used')
+    parser.add_argument('--checkpoint-steps', type=int, help='the steps between two checkpoints, at least 1')
+    parser.add_argument('--checkpoint-seconds', type=float, help='the seconds between two checkpoints')
+    parser.add_argument('--resume', help='continue the run saved in this checkpoint; --steps and --copies are '
+                                         'the totals to reach, the walker, its seed and its scene come from the '
+                                         'checkpoint, so --type, --chances, --name, --seed and --scene can not be '
+                                         'given')
+    parser.add_argument('--profile', help='record the counters and timers of Instrument and save them to this '
+                                          'JSON file (copies simulated in worker processes are not recorded)')
+    return parser
+
+
+def run(argv: Sequence[str], out: TextIO = sys.stdout) -> Dict[str, Any]:
+    """
+    Run a walker for a number of steps, average it with its copies and save the results, as described by the
+    options of build_parser.
+
+    :param argv: The command line options, without 'run'
+    :param out: Where to report what was done
+    :return: A summary of the run: the seed, the number of steps and copies, and the time taken by each part
+    """
+    parser = build_parser()
+    options = parser.parse_args(argv)
+    steps = int(options.steps)
+    copies = int(options.copies)
+    if steps < 0 or copies < 1:
+        parser.error('--steps must be at least 0 and --copies at least 1')
+    if options.checkpoint_steps is not None and options.checkpoint_steps < 1:
+        parser.error('--checkpoint-steps must be at least 1')
+    if options.checkpoint_seconds is not None and options.checkpoint_seconds <= 0:
+        parser.error('--checkpoint-seconds must be more than 0')
+    if (options.checkpoint_steps or options.checkpoint_seconds) and not options.checkpoint:
+        parser.error('--checkpoint-steps and --checkpoint-seconds need --checkpoint')
+    if options.checkpoint and not (options.checkpoint_steps or options.checkpoint_seconds):
+        parser.error('--checkpoint needs --checkpoint-steps or --checkpoint-seconds')
+    if options.resume:
+        given = [option for option, value in (('--type', options.type), ('--chances', options.chances),
+                                              ('--name', options.name), ('--seed', options.seed),
+                                              ('--scene', options.scene)) if value is not None]
+        if given:
+            parser.error('{} can not be given with --resume, they come from the checkpoint'.format(', '.join(given)))
+    walker_type = options.type or 1
+    name = options.name or 'Walker'
+    chances = None
+    if walker_type == 4 and not options.resume:
+        if options.chances is None:
+            parser.error('a type 4 walker needs --chances')
+        chances = list(options.chances)
+        if sum(chances) > 1.5:
+            chances = [chance / 100.0 for chance in chances]
+        if abs(sum(chances) - 1) > 1e-6:
+            parser.error('--chances must add up to 1 (or 100)')
+
+    cache = Cache.EnsembleCache(directory=options.cache_dir) if options.cache_dir else None
+    if options.resume:
+        snapshot = Checkpoint.load(options.resume, storage=options.storage)
+        if not snapshot.walkers:
+            parser.error('the checkpoint {} has no walker to resume'.format(options.resume))
+        walker = snapshot.walkers[0]
+        world = snapshot.world
+        seed = snapshot.metadata.get('seed')
+        print('Resumed at step {:,} with {:,} copies'.format(walker.stats.iterations, walker.copies), file=out)
+    else:
+        world = World()
+        if options.scene:
+            try:
+                with open(options.scene) as f:
+                    world = World.from_dict(json.load(f))
+            except OSError as error:
+                parser.error('can not read the scene {}: {}'.format(options.scene, error))
+            except (KeyError, IndexError, TypeError, ValueError) as error:
+                parser.error('the scene {} is not a valid World.to_dict file: {!r}'.format(options.scene, error))
+        seed = options.seed if options.seed is not None else str(random.randint(1, 99999999))
+        walker = Walker(name, walker_type, None, False, chances=chances, world=world,
+                        storage=options.storage or 'compact', seed=Seeds.seed_sequence(seed, name))
+
+    if options.profile:
+        Instrument.reset()
+        Instrument.enable()
+    start = time.perf_counter()
+    first_step = walker.stats.iterations
+    # nothing is drawn, only the walker's statistics and whatever else was asked for consume the steps
+    consumers: List[Stream.Consumer] = [Stream.StatsRecorder(walker.stats)]
+    chunk = Stream.CHUNK_STEPS
+    if options.positions:
+        # a resumed run continues the positions written before its checkpoint
+        try:
+            consumers.append(Stream.PositionWriter(options.positions, first_step))
+        except ValueError as error:
+            parser.error(str(error))
+    checkpointer = None
+    if options.checkpoint:
+        checkpointer = Checkpoint.Checkpointer(options.checkpoint, [walker], world, options.checkpoint_steps,
+                                               options.checkpoint_seconds, {'seed': seed}, consumers)
+        consumers.append(checkpointer)
+        if checkpointer.every_steps:
+            chunk = min(chunk, checkpointer.every_steps)
+    Stream.run(walker, steps - first_step, consumers, chunk)
+    walk_time = time.perf_counter() - start
+    walked = max(steps - first_step, 0)
+    print('Walked {:,} steps in {:.2f} s ({:,.0f} steps/s)'.format(walked, walk_time, walked / max(walk_time, 1e-9)),
+          file=out)
+
+    start = time.perf_counter()
+    if copies > 1:
+        # copies already averaged before the checkpoint are kept when the walker did not take more steps
+        new_copies = copies - (walker.copies if walker.averages.steps == walker.stats.iterations + 1 else 1)
+        if checkpointer is not None:
+            # merged block by block and checkpointed between blocks, so a resumed run starts from the last block
+            walker.copy(copies, workers=options.workers,
+                        on_block=lambda block: checkpointer.step(block * walker.stats.iterations))
+        else:
+            walker.copy(copies, workers=options.workers, cache=cache)
+        copy_time = time.perf_counter() - start
+        copy_steps = max(new_copies, 0) * walker.stats.iterations
+        print('Simulated {:,} copies of {:,} steps in {:.2f} s ({:,.0f} steps/s)'.format(
+            max(new_copies, 0), walker.stats.iterations, copy_time, copy_steps / max(copy_time, 1e-9)), file=out)
+    else:
+        copy_time = 0.0
+    if checkpointer is not None:
+        checkpointer.save()
+
+    if options.out:
+        if options.format == 'npz':
+            Export.save_npz(options.out, walker)
+        else:
+            Export.save_columns(options.out, walker)
+        print('Saved to {}'.format(options.out), file=out)
+    if options.profile:
+        Instrument.enable(False)
+        Instrument.dump(options.profile)
+        print('Profile saved to {}'.format(options.profile), file=out)
+    print('Seed: {}'.format(seed), file=out)
+    return {'seed': seed, 'steps': steps, 'copies': copies, 'walk_time': walk_time, 'copy_time': copy_time}
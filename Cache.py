@@ -0,0 +1,136 @@
+import collections
+import hashlib
+import os
+import numpy as np
+from typing import *
+from Stats import METRICS
+
+# the most bytes of statistics the in-memory tier holds before it forgets the least recently used entries
+MAX_BYTES = 256 * 1024 * 1024
+
+Entry = Tuple[int, Dict[str, np.ndarray], Dict[str, np.ndarray]]
+
+
+class EnsembleCache:
+    """
+    Remembers the statistics of ensembles of walker copies, so the same analysis does not simulate them twice.
+    An entry is the (count, means, M2s) aggregate of a range of copies, as returned by Ensemble.ensemble_stats,
+    keyed by everything the copies depend on (see ensemble_key).
+
+    The entries are kept in memory, least recently used first out once they take more than max_bytes, and
+    optionally also written to a directory as NPZ files that outlive the app.
+
+    Attributes:
+    - max_bytes: the most bytes the in-memory entries may take
+    - directory: the directory of the on-disk tier, or None to keep the entries in memory only
+    - entries: the in-memory entries, from least to most recently used
+    - nbytes: the bytes taken by the in-memory entries
+    - hits, misses: the number of lookups that found an entry or not
+    """
+    def __init__(self, max_bytes: int = MAX_BYTES, directory: Optional[str] = None) -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries: collections.OrderedDict = collections.OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: Tuple) -> Optional[Entry]:
+        """
+        :param key: The key of the ensemble, see ensemble_key
+        :return: The cached (count, means, M2s) of the ensemble, or None if it was never stored
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        entry = self._load(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: Tuple, entry: Entry) -> None:
+        """
+        Store the statistics of an ensemble in memory, and on disk when there is a directory.
+
+        :param key: The key of the ensemble, see ensemble_key
+        :param entry: The (count, means, M2s) of the ensemble
+        """
+        self._remember(key, entry)
+        if self.directory is not None:
+            self._save(key, entry)
+
+    def clear(self) -> None:
+        """
+        Forget the in-memory entries, leaving the files of the on-disk tier alone.
+        """
+        self.entries.clear()
+        self.nbytes = 0
+
+    def _remember(self, key: Tuple, entry: Entry) -> None:
+        if key in self.entries:
+            self.nbytes -= self.size(self.entries.pop(key))
+        size = self.size(entry)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = entry
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            key, evicted = self.entries.popitem(last=False)
+            self.nbytes -= self.size(evicted)
+
+    def _path(self, key: Tuple) -> str:
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode()).hexdigest() + '.npz')
+
+    def _save(self, key: Tuple, entry: Entry) -> None:
+        count, means, m2s = entry
+        arrays = {'key': np.array(repr(key)), 'count': np.array(count)}
+        for name in METRICS:
+            arrays['mean_' + name] = means[name]
+            arrays['m2_' + name] = m2s[name]
+        path = self._path(key)
+        # written next to its final name and moved in place, so a crash never leaves half a file behind
+        temporary = path + '.tmp.npz'
+        np.savez_compressed(temporary, **arrays)
+        os.replace(temporary, path)
+
+    def _load(self, key: Tuple) -> Optional[Entry]:
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if str(data['key']) != repr(key):
+                return None
+            return (int(data['count']), {name: data['mean_' + name] for name in METRICS},
+                    {name: data['m2_' + name] for name in METRICS})
+
+    @staticmethod
+    def size(entry: Entry) -> int:
+        """
+        :return: The bytes taken by the arrays of an entry
+        """
+        count, means, m2s = entry
+        return sum(array.nbytes for array in means.values()) + sum(array.nbytes for array in m2s.values())
+
+
+def ensemble_key(type: int, iterations: int, first: int, last: int, seed: np.random.SeedSequence,
+                 chances: Optional[Sequence[float]] = None, world: Any = None) -> Tuple:
+    """
+    :return: The key of the copies numbered first to last - 1 of a walker, made of everything their statistics
+        depend on: the walker's seed (which includes its name), type, chances, number of steps and the walls and
+        portals of its world
+    """
+    return (int(seed.entropy), tuple(int(key) for key in seed.spawn_key), type,
+            tuple(float(chance) for chance in chances) if type == 4 and chances else None, iterations,
+            world.fingerprint() if world is not None and world.has_obstacles() else None, first, last)
+
+
+# the cache the walkers use unless they are given another one
+default_cache = EnsembleCache()
@@ -0,0 +1,182 @@
+import json
+import os
+import time
+import numpy as np
+from typing import *
+import Export
+import Stream
+from Stats import COLUMNS, WalkerStats, AverageStats
+from Walker import Walker
+from World import World
+
+# the version of the checkpoint files written by this module, stored in their metadata
+FORMAT_VERSION = 1
+
+
+class Snapshot:
+    """
+    A simulation as loaded from a checkpoint, ready to keep stepping.
+
+    Attributes:
+    - walkers: the walkers, with their statistics, averages and random streams where they were
+    - world: the walls and portals, shared by the walkers
+    - metadata: anything else saved with the checkpoint (see save)
+    """
+    def __init__(self, walkers: List[Walker], world: World, metadata: Dict[str, Any]) -> None:
+        self.walkers = walkers
+        self.world = world
+        self.metadata = metadata
+
+
+def save(path: str, walkers: Sequence[Walker], world: World, metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Save everything needed to continue a simulation exactly where it is to a compressed NPZ file: the world, and
+    for every walker its position, counters, statistics, averages over its copies and the state of its random
+    stream. The file is written next to its final name and moved in place, so a crash while saving leaves the
+    previous checkpoint intact.
+
+    :param path: The file to write
+    :param walkers: The walkers to save
+    :param world: The walls and portals the walkers step through
+    :param metadata: Anything else to save, as plain values ready for JSON (optional)
+    """
+    arrays = {}
+    walker_states = []
+    for index, walker in enumerate(walkers):
+        prefix = 'walker{}_'.format(index)
+        state = Export.walker_metadata(walker)
+        del state['world']
+        random_state = walker.random_state()
+        stats = walker.stats
+        state.update({
+            'color': walker.color,
+            'storage': stats.storage,
+            'position': [walker.lastx, walker.lasty],
+            'intersection': walker.intersection,
+            'attempted_steps': walker.attempted_steps,
+            'rejected_steps': walker.rejected_steps,
+            'stuck_steps': walker.stuck_steps,
+            'bit_generator': random_state['bit_generator'],
+            'last': [stats.last_radius_steps, stats.last_times_crossed_x, stats.last_times_crossed_y,
+                     stats.last_sign_x, stats.last_sign_y],
+        })
+        walker_states.append(state)
+        arrays[prefix + 'uniforms'] = np.array(random_state['uniforms'], dtype=float)
+        for name, values in stats.columns().items():
+            arrays[prefix + 'stats_' + name] = values
+        if walker.averages.count:
+            for name, values in Export.averages_arrays(walker.averages).items():
+                arrays[prefix + name] = values
+    arrays['metadata'] = np.array(json.dumps({
+        'version': FORMAT_VERSION,
+        'time': time.time(),
+        'world': world.to_dict(),
+        'walkers': walker_states,
+        'extra': metadata or {},
+    }))
+    # np.savez adds the extension unless the name already ends with it
+    temporary = path + '.tmp.npz'
+    np.savez_compressed(temporary, **arrays)
+    os.replace(temporary, path)
+
+
+def load(path: str, app=None, storage: Optional[str] = None) -> Snapshot:
+    """
+    Load a checkpoint written by save. Stepping the loaded walkers gives the same steps, statistics and averages
+    the saved walkers would have had.
+
+    :param path: The checkpoint file
+    :param app: The application the walkers are drawn in (optional)
+    :param storage: How the loaded statistics are stored, see WalkerStats (defaults to how they were saved)
+    :return: The walkers, their world and the extra metadata
+    """
+    with np.load(path) as data:
+        metadata = json.loads(str(data['metadata']))
+        world = World.from_dict(metadata['world'])
+        walkers = []
+        for index, state in enumerate(metadata['walkers']):
+            prefix = 'walker{}_'.format(index)
+            seed = np.random.SeedSequence(int(state['seed']['entropy']), spawn_key=tuple(state['seed']['spawn_key']))
+            walker = Walker(state['name'], state['type'], state['color'], app is not None, app=app,
+                            chances=state['chances'], world=world, seed=seed)
+            walker.lastx, walker.lasty = state['position']
+            walker.intersection = state['intersection']
+            walker.attempted_steps = state['attempted_steps']
+            walker.rejected_steps = state['rejected_steps']
+            walker.stuck_steps = state['stuck_steps']
+            walker.set_random_state({'bit_generator': state['bit_generator'], 'uniforms': data[prefix + 'uniforms']})
+            stats = WalkerStats.from_columns({name: data[prefix + 'stats_' + name] for name in COLUMNS},
+                                             storage or state['storage'])
+            (stats.last_radius_steps, stats.last_times_crossed_x, stats.last_times_crossed_y,
+             stats.last_sign_x, stats.last_sign_y) = state['last']
+            walker.stats = stats
+            walker.averages = AverageStats(walker)
+            if prefix + 'count' in data:
+                saved = Export.averages_from_arrays(
+                    {name[len(prefix):]: data[name] for name in data.files if name.startswith(prefix)})
+                # the saved averages already include the walker itself
+                walker.averages.count, walker.averages.means, walker.averages.m2s = saved.count, saved.means, saved.m2s
+            walker.copies = state['copies']
+            walkers.append(walker)
+    return Snapshot(walkers, world, metadata['extra'])
+
+
+class Checkpointer(Stream.Consumer):
+    """
+    Saves a checkpoint every so many steps, every so many seconds, or both, whichever comes first. The loop
+    running the simulation calls `step` after every step (or block of steps); the checkpoint itself is only
+    written when one is due. It can also consume the chunks of Stream.run, after the StatsRecorder of the walker
+    so the statistics it saves are up to date.
+
+    Attributes:
+    - path: the checkpoint file
+    - walkers, world: what is saved, see save
+    - metadata: the extra metadata saved with every checkpoint
+    - every_steps: the steps between two checkpoints, or None
+    - every_seconds: the wall time in seconds between two checkpoints, or None
+    - saves: the number of checkpoints written so far
+    - consumers: the consumers of the same steps, flushed before every checkpoint so what they wrote is never
+      behind the checkpoint (it may hold more steps, which a resumed run drops)
+    """
+    def __init__(self, path: str, walkers: Sequence[Walker], world: World, every_steps: Optional[int] = None,
+                 every_seconds: Optional[float] = None, metadata: Optional[Dict[str, Any]] = None,
+                 consumers: Sequence[Stream.Consumer] = ()) -> None:
+        self.path = path
+        self.consumers = consumers
+        self.walkers = walkers
+        self.world = world
+        self.metadata = metadata
+        self.every_steps = every_steps
+        self.every_seconds = every_seconds
+        self.saves = 0
+        self._steps = 0
+        self._last_time = time.monotonic()
+
+    def step(self, steps: int = 1) -> bool:
+        """
+        :param steps: The number of steps taken since the last call
+        :return: True if a checkpoint was saved
+        """
+        self._steps += steps
+        if self.every_steps is not None and self._steps >= self.every_steps:
+            self.save()
+            return True
+        if self.every_seconds is not None and time.monotonic() - self._last_time >= self.every_seconds:
+            self.save()
+            return True
+        return False
+
+    def consume(self, chunk: Stream.StepChunk) -> None:
+        self.step(len(chunk))
+
+    def save(self) -> None:
+        """
+        Save a checkpoint now.
+        """
+        for consumer in self.consumers:
+            if consumer is not self:
+                consumer.flush()
+        save(self.path, self.walkers, self.world, self.metadata)
+        self.saves += 1
+        self._steps = 0
+        self._last_time = time.monotonic()
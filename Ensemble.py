@@ -0,0 +1,275 @@
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import *
+import Seeds
+from Stats import METRICS, AverageStats
+
+# the directions a type 4 walker can choose, in the order of its chances (up, down, left, right)
+TYPE_4_DIRECTIONS = np.array([180, 0, 270, 90])
+# the number of uniform random numbers a walker of each type draws per step
+DRAWS_PER_STEP = {1: 1, 2: 2, 3: 1, 4: 1}
+# the number of copies simulated together, and sent to a worker process as one job
+ENSEMBLE_BLOCK = 256
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+
+
+def simulate_positions(type: int, rngs: Sequence[np.random.Generator], iterations: int,
+                       chances: Optional[Sequence[float]] = None) -> np.ndarray:
+    """
+    Advances a whole block of walkers at once, without obstacles.
+    The angles and distances of every step are sampled in bulk and the displacements are summed cumulatively.
+    Type 4 walkers may step towards (0,0), which depends on where they are, so they are advanced one step at a
+    time for the whole block together.
+
+    Every walker draws its steps from its own generator, so a walker's path does not depend on which block it
+    is simulated in.
+
+    :param type: The type of the walkers (1, 2, 3 or 4)
+    :param rngs: One numpy random generator per walker in the block
+    :param iterations: The number of steps each walker takes
+    :param chances: The chances of a type 4 walker (optional)
+    :return: An array of shape (copies, iterations + 1, 2) holding the (x, y) position of every walker after
+        every step, starting at (0, 0)
+    """
+    if type not in DRAWS_PER_STEP:
+        raise ValueError('Walkers of type {} can not be simulated in bulk'.format(type))
+    draws = DRAWS_PER_STEP[type]
+    uniforms = np.stack([rng.random(iterations * draws) for rng in rngs]).reshape(len(rngs), iterations, draws)
+    if type == 4:
+        return simulate_type_4_positions(chances or [], uniforms[:, :, 0])
+    distance = np.full((len(rngs), iterations), 10.0)
+    if type == 2:
+        # the same as random.uniform(0.5, 1.5)
+        distance *= 0.5 + uniforms[:, :, 0]
+    if type == 3:
+        direction = np.floor(uniforms[:, :, 0] * 4) * 90
+    else:
+        # a whole number of degrees between 0 and 360, like random.randint(0, 360)
+        direction = np.floor(uniforms[:, :, -1] * 361)
+    angle_radians = np.radians(direction)
+
+    positions = np.zeros((len(rngs), iterations + 1, 2))
+    np.cumsum(distance * np.sin(angle_radians), axis=1, out=positions[:, 1:, 0])
+    np.cumsum(distance * np.cos(angle_radians), axis=1, out=positions[:, 1:, 1])
+    return positions
+
+
+def simulate_type_4_positions(chances: Sequence[float], uniforms: np.ndarray) -> np.ndarray:
+    """
+    Advances a whole block of type 4 walkers at once, without obstacles. The choices of every step are made
+    up front, and each step moves all the walkers of the block together.
+
+    :param chances: The chances of going up, down, left, right and towards (0,0)
+    :param uniforms: An array of shape (copies, iterations) of random numbers between 0 and 1, one per step
+    :return: An array of shape (copies, iterations + 1, 2) holding the (x, y) position of every walker after
+        every step, starting at (0, 0)
+    """
+    copies, iterations = uniforms.shape
+    cum_chances = np.cumsum(chances[:len(TYPE_4_DIRECTIONS)])
+    choices = type_4_choices(cum_chances, uniforms)
+    fixed_radians = np.radians(TYPE_4_DIRECTIONS)
+    # the displacement of each fixed direction, with a placeholder for steps towards (0,0)
+    delta_x = np.append(10.0 * np.sin(fixed_radians), 0.0)
+    delta_y = np.append(10.0 * np.cos(fixed_radians), 0.0)
+    to_center = len(TYPE_4_DIRECTIONS)
+
+    positions = np.zeros((copies, iterations + 1, 2))
+    x = np.zeros(copies)
+    y = np.zeros(copies)
+    for i in range(iterations):
+        choice = choices[:, i]
+        step_x = delta_x[choice]
+        step_y = delta_y[choice]
+        centered = choice == to_center
+        if centered.any():
+            # the same angle as Walker.calculate_angle_to_center
+            angle_radians = np.radians(np.degrees(np.arctan2(x[centered], y[centered])) + 180)
+            step_x[centered] = 10.0 * np.sin(angle_radians)
+            step_y[centered] = 10.0 * np.cos(angle_radians)
+        x += step_x
+        y += step_y
+        positions[:, i + 1, 0] = x
+        positions[:, i + 1, 1] = y
+    return positions
+
+
+def sample_type_4_choices(cum_chances: Sequence[float], size: Union[int, Tuple[int, ...]],
+                          rng: np.random.Generator) -> np.ndarray:
+    """
+    Sample many type 4 moves at once from a table of cumulative chances.
+
+    :param cum_chances: The cumulative chances of the four fixed directions
+    :param size: The number (or shape) of moves to sample
+    :param rng: The numpy random generator to draw from
+    :return: An array of choices, each an index into TYPE_4_DIRECTIONS or len(TYPE_4_DIRECTIONS) for a step
+        towards (0,0)
+    """
+    return type_4_choices(cum_chances, rng.random(size))
+
+
+def type_4_choices(cum_chances: Sequence[float], uniforms: np.ndarray) -> np.ndarray:
+    """
+    :param cum_chances: The cumulative chances of the four fixed directions
+    :param uniforms: Random numbers between 0 and 1
+    :return: The type 4 choice each random number picks, like Walker.sample_move does with bisect
+    """
+    return np.searchsorted(np.asarray(cum_chances, dtype=float), uniforms, side='right')
+
+
+def simulate_block(job: Tuple) -> Tuple[int, Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Simulates a range of copies of a walker and averages their statistics. This runs in the worker processes,
+    so it only receives plain data.
+
+    :param job: A tuple of (type, chances, iterations, world, seed, first, last): the walker's type, chances,
+        number of steps and World, the walker's seed sequence, and the range of copy indices to simulate
+    :return: The count, means and M2s of the block, ready for AverageStats.merge
+    """
+    # imported here so the worker processes only load the walker when they need to step it
+    import Walker
+
+    type, chances, iterations, world, seed, first, last = job
+    sequences = [Seeds.child_sequence(seed, index) for index in range(first, last)]
+    averages = AverageStats()
+    if world is None or not world.has_obstacles():
+        rngs = [np.random.default_rng(sequence) for sequence in sequences]
+        averages.update_batch(positions_to_stats(simulate_positions(type, rngs, iterations, chances)))
+    else:
+        for sequence in sequences:
+            sub_walker = Walker.Walker('', type, None, False, chances=chances, is_sub=True, world=world,
+                                       storage='compact', seed=sequence)
+            for i in range(iterations):
+                sub_walker.step()
+            averages.add(sub_walker.stats)
+    return averages.count, averages.means, averages.m2s
+
+
+def run_ensemble(averages: AverageStats, type: int, iterations: int, first: int, last: int,
+                 seed: np.random.SeedSequence, chances: Optional[Sequence[float]] = None, world: Any = None,
+                 workers: int = 1, progress: Optional[Callable[[int], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None) -> None:
+    """
+    Simulates the copies numbered first to last - 1 of a walker and merges their statistics into `averages`.
+
+    The copies are split into blocks of ENSEMBLE_BLOCK and, with more than one worker, simulated in a process
+    pool. Every copy draws from its own seed sequence and the blocks are merged in order as they complete, so
+    the result is the same bit for bit whatever the number of workers.
+
+    :param averages: The averages to merge the copies into
+    :param type: The type of the walker
+    :param iterations: The number of steps each copy takes
+    :param first: The index of the first copy to simulate (the walker itself is copy 0)
+    :param last: One past the index of the last copy to simulate
+    :param seed: The seed sequence of the walker, see Seeds.seed_sequence
+    :param chances: The chances of a type 4 walker (optional)
+    :param world: The World the copies walk in (optional)
+    :param workers: The number of worker processes to use, 1 simulates everything in this process
+    :param progress: Called with the number of copies merged so far after every block (optional)
+    :param cancelled: Checked after every block, the remaining blocks are dropped once it returns True (optional)
+    :return: None
+    """
+    jobs = [(type, chances, iterations, world, seed, start, min(start + ENSEMBLE_BLOCK, last))
+            for start in range(first, last, ENSEMBLE_BLOCK)]
+    done = 0
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            if cancelled is not None and cancelled():
+                return
+            averages.merge(*simulate_block(job))
+            done += job[6] - job[5]
+            if progress is not None:
+                progress(done)
+        return
+
+    futures = {get_executor(workers).submit(simulate_block, job): index for index, job in enumerate(jobs)}
+    results = {}
+    next_index = 0
+    for future in as_completed(futures):
+        if cancelled is not None and cancelled():
+            for pending in futures:
+                pending.cancel()
+            return
+        results[futures[future]] = future.result()
+        # merge in job order so floating point sums do not depend on which worker finished first
+        while next_index in results:
+            averages.merge(*results.pop(next_index))
+            done += jobs[next_index][6] - jobs[next_index][5]
+            next_index += 1
+            if progress is not None:
+                progress(done)
+
+
+def ensemble_stats(type: int, iterations: int, first: int, last: int, seed: np.random.SeedSequence,
+                   chances: Optional[Sequence[float]] = None, world: Any = None, workers: int = 1,
+                   progress: Optional[Callable[[int], None]] = None,
+                   cancelled: Optional[Callable[[], bool]] = None) -> Tuple[int, Dict[str, np.ndarray],
+                                                                            Dict[str, np.ndarray]]:
+    """
+    Simulates copies of a walker like run_ensemble, but into averages of their own, so it can run away from the
+    walker (e.g. in a SimulationWorker) while the walker keeps stepping.
+
+    :return: The count, means and M2s of the copies, ready for AverageStats.merge
+    """
+    averages = AverageStats()
+    run_ensemble(averages, type, iterations, first, last, seed, chances, world, workers, progress, cancelled)
+    return averages.count, averages.means, averages.m2s
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    :param workers: The number of worker processes
+    :return: A process pool with that many workers, kept between calls so the workers only start once
+    """
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown()
+        # spawned rather than forked, so the workers never inherit the Tk interpreter
+        _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        _executor_workers = workers
+    return _executor
+
+
+def positions_to_stats(positions: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Calculates the same per-step statistics as WalkerStats.update, for a whole block of walkers.
+
+    :param positions: An array of shape (copies, steps, 2) as returned by simulate_positions
+    :return: A dictionary mapping every name in METRICS to an array of shape (copies, steps)
+    """
+    # WalkerStats records the positions truncated to integers
+    cells = np.trunc(positions).astype(np.int64)
+    x = cells[:, :, 0]
+    y = cells[:, :, 1]
+    distance_from_center = np.sqrt(x * x + y * y)
+    radius_steps = np.cumsum(np.ceil(distance_from_center), axis=1).astype(np.int64)
+    return {
+        'distance_from_center': distance_from_center,
+        'distance_from_x': np.abs(x),
+        'distance_from_y': np.abs(y),
+        'radius_steps': radius_steps,
+        'times_crossed_x': count_crossings(y),
+        'times_crossed_y': count_crossings(x),
+    }
+
+
+def count_crossings(values: np.ndarray) -> np.ndarray:
+    """
+    Counts how many times a coordinate changed sign, the way WalkerStats does: a step onto the axis is not a
+    crossing, but leaving it to the side opposite to the last non-zero value is.
+
+    :param values: An array of shape (copies, steps) of integer coordinates, starting at 0
+    :return: An array of the same shape with the cumulative number of crossings at every step
+    """
+    signs = np.sign(values)
+    steps = np.arange(values.shape[1])
+    # index of the last non-zero sign seen up to every step
+    last_nonzero = np.maximum.accumulate(np.where(signs != 0, steps, 0), axis=1)
+    previous = np.take_along_axis(signs, last_nonzero, axis=1)[:, :-1]
+    crossed = (signs[:, 1:] != 0) & (previous == -signs[:, 1:])
+    crossings = np.zeros(values.shape, dtype=np.int64)
+    np.cumsum(crossed, axis=1, out=crossings[:, 1:])
+    return crossings
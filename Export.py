@@ -0,0 +1,164 @@
+import json
+import os
+import numpy as np
+from typing import *
+from Stats import COLUMNS, METRICS, WalkerStats, AverageStats
+from World import World
+
+# the version of the files written by this module, stored in their metadata
+FORMAT_VERSION = 1
+# the most rows of a statistic written to one file of a column directory
+CHUNK_ROWS = 1_000_000
+
+
+class Run:
+    """
+    A walker's run as loaded from an export.
+
+    Attributes:
+    - metadata: the name, type, chances, seed, number of steps and copies of the walker, and its walls and portals
+    - stats: the statistics of the walker at every step
+    - averages: the averages over the walker and its copies, or None if they were not exported
+    """
+    def __init__(self, metadata: Dict[str, Any], stats: WalkerStats, averages: Optional[AverageStats]) -> None:
+        self.metadata = metadata
+        self.stats = stats
+        self.averages = averages
+
+    def seed(self) -> np.random.SeedSequence:
+        """
+        :return: The seed sequence of the walker, to make it or its copies walk the same way again
+        """
+        seed = self.metadata['seed']
+        return np.random.SeedSequence(int(seed['entropy']), spawn_key=tuple(seed['spawn_key']))
+
+    def world(self) -> World:
+        """
+        :return: A world with the walls and portals the walker walked through
+        """
+        return World.from_dict(self.metadata['world'])
+
+
+def walker_metadata(walker) -> Dict[str, Any]:
+    """
+    :param walker: The walker to describe
+    :return: Everything needed to know how the walker's statistics were made, as plain values ready for JSON
+    """
+    return {
+        'version': FORMAT_VERSION,
+        'name': walker.name,
+        'type': walker.type,
+        'chances': list(walker.chances) if walker.chances else None,
+        # the entropy can be larger than JSON readers handle as a number
+        'seed': {'entropy': str(walker.seed.entropy), 'spawn_key': [int(key) for key in walker.seed.spawn_key]},
+        'iterations': walker.stats.iterations,
+        'copies': walker.copies,
+        'world': walker.world.to_dict(),
+    }
+
+
+def save_npz(path: str, walker, averages: bool = True) -> None:
+    """
+    Export the statistics of a walker, and optionally its averages, to a compressed NPZ file with its metadata.
+
+    :param path: The file to write
+    :param walker: The walker to export
+    :param averages: True to also export the averages over the walker's copies
+    """
+    arrays = {'metadata': np.array(json.dumps(walker_metadata(walker)))}
+    for name, values in walker.stats.columns().items():
+        arrays['stats_' + name] = values
+    if averages and walker.averages is not None:
+        arrays.update(averages_arrays(walker.averages))
+    np.savez_compressed(path, **arrays)
+
+
+def save_columns(directory: str, walker, averages: bool = True, chunk_rows: int = CHUNK_ROWS) -> None:
+    """
+    Export the statistics of a walker to a directory holding a metadata.json file and every statistic as one or
+    more .npy files of at most chunk_rows rows, which can be memory-mapped when loaded.
+
+    :param directory: The directory to write, created if needed
+    :param walker: The walker to export
+    :param averages: True to also export the averages over the walker's copies
+    :param chunk_rows: The most rows of a statistic in one file
+    """
+    os.makedirs(directory, exist_ok=True)
+    metadata = walker_metadata(walker)
+    metadata['chunks'] = {}
+    for name, values in walker.stats.columns().items():
+        starts = range(0, max(len(values), 1), chunk_rows)
+        for index, start in enumerate(starts):
+            np.save(os.path.join(directory, '{}.{}.npy'.format(name, index)), values[start:start + chunk_rows])
+        metadata['chunks'][name] = len(starts)
+    if averages and walker.averages is not None:
+        for name, values in averages_arrays(walker.averages).items():
+            np.save(os.path.join(directory, name + '.npy'), values)
+    with open(os.path.join(directory, 'metadata.json'), 'w') as f:
+        json.dump(metadata, f)
+
+
+def load(path: str, storage: str = 'compact') -> Run:
+    """
+    Load a run exported by save_npz or save_columns.
+
+    :param path: The NPZ file or the column directory
+    :param storage: How the loaded statistics are stored, see WalkerStats
+    :return: The run
+    """
+    if os.path.isdir(path):
+        return load_columns(path, storage)
+    return load_npz(path, storage)
+
+
+def load_npz(path: str, storage: str = 'compact') -> Run:
+    """
+    Load a run exported by save_npz.
+    """
+    with np.load(path) as data:
+        metadata = json.loads(str(data['metadata']))
+        stats = WalkerStats.from_columns({name: data['stats_' + name] for name in COLUMNS}, storage)
+        averages = averages_from_arrays(data) if 'count' in data else None
+    return Run(metadata, stats, averages)
+
+
+def load_columns(directory: str, storage: str = 'compact') -> Run:
+    """
+    Load a run exported by save_columns. The files are memory-mapped, so every statistic is read once, straight
+    into its column.
+    """
+    with open(os.path.join(directory, 'metadata.json')) as f:
+        metadata = json.load(f)
+    columns = {}
+    for name in COLUMNS:
+        chunks = [np.load(os.path.join(directory, '{}.{}.npy'.format(name, index)), mmap_mode='r')
+                  for index in range(metadata['chunks'][name])]
+        columns[name] = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+    stats = WalkerStats.from_columns(columns, storage)
+    averages = None
+    if os.path.exists(os.path.join(directory, 'count.npy')):
+        averages = averages_from_arrays({name[:-len('.npy')]: np.load(os.path.join(directory, name))
+                                         for name in os.listdir(directory)
+                                         if name.endswith('.npy') and name.count('.') == 1})
+    return Run(metadata, stats, averages)
+
+
+def averages_arrays(averages: AverageStats) -> Dict[str, np.ndarray]:
+    """
+    :return: The count, means and M2s of the averages as named arrays
+    """
+    arrays = {'count': np.array(averages.count)}
+    for name in METRICS:
+        arrays['mean_' + name] = averages.mean(name)
+        arrays['m2_' + name] = averages.m2s.get(name, np.zeros_like(averages.mean(name)))
+    return arrays
+
+
+def averages_from_arrays(arrays: Mapping[str, np.ndarray]) -> AverageStats:
+    """
+    :return: Averages rebuilt from the arrays of averages_arrays
+    """
+    averages = AverageStats()
+    averages.merge(int(arrays['count']), {name: np.asarray(arrays['mean_' + name]) for name in METRICS},
+                   {name: np.asarray(arrays['m2_' + name]) for name in METRICS})
+    return averages
@@ -1,5 +1,6 @@
 import os
 import random
+import time
 import tkinter as tk
 import typing
 from tkinter import colorchooser, ttk, messagebox, filedialog
@@ -7,9 +8,21 @@ import typing_extensions
 from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg, NavigationToolbar2Tk)
 from matplotlib.figure import Figure
 import numpy as np
+import Export
+import Instrument
+import Render
+import Scheduler
+import Seeds
 import Walker
+import Worker
+import World
 from typing import *
 
+# the time in milliseconds between two updates of the status bar
+STATUS_INTERVAL = 500
+# the time in milliseconds the stats window waits after the last change before refreshing the plots
+PLOT_DEBOUNCE = 150
+
 # global active_walker
 class Gui(tk.Tk):
     """
@@ -20,9 +33,15 @@ class Gui(tk.Tk):
     - walkers: a list of Walker objects in the simulation
     - walls: a list of wall coordinates in the simulation
     - portals: a dictionary mapping portal names to portal coordinates in the simulation
+    - world: the headless model of the walls and portals that the walkers step through
+    - renderer: draws the walkers' trajectories on the canvas, a few polylines per walker
+    - scheduler: runs the steps of 'Take Steps' within a frame-time budget
+    - worker: simulates the copies of the stats window on a background thread
+    - status: the status bar text, showing the steps per second, canvas items and rejection rate
     - color: the default color of the walkers in the simulation
     - portal_color: the default color of the portals in the simulation
-    - zoomed: the zoom level of the canvas in the simulation
+    - zoomed: the zoom level of the canvas in the simulation, applied to the unzoomed coordinates when drawing
+    - axes: the canvas item ids of the coordinate axis
     - iterating: a boolean indicating whether the simulation is currently iterating
     - moving: a boolean indicating whether the simulation is currently moving
     - seed: the seed for the random number generator in the simulation
@@ -35,6 +54,7 @@ class Gui(tk.Tk):
         self.walkers: List[Walker.Walker] = []
         self.walls: List[int] = []
         self.portals: Dict[int, int] = {}
+        self.world = World.World()
         self.color: Optional[str] = 'red'
         self.portal_color: Optional[str] = 'gold'
         self.zoomed = 1.0
@@ -58,9 +78,14 @@ class Gui(tk.Tk):
 
         self.canvas = tk.Canvas(self, bg='white') # creates the canvas
         self.canvas.grid(row=0, column=2, sticky='nswe')
+        self.renderer = Render.TrajectoryRenderer(self)
+        self.scheduler = Scheduler.StepScheduler(self)
+        self.worker = Worker.SimulationWorker(self)
+        self._create_status_bar()
         self.center = (0, 0)
         self._xshifted = 0
         self._yshifted = 0
+        self.axes: List[int] = []
         self.click_position = (0.0, 0.0)
         self.wall = 0
         self.oval = 0
@@ -87,8 +112,8 @@ class Gui(tk.Tk):
         """
         mid_x = self.center[0]
         mid_y = self.center[1]
-        self.canvas.create_line(0, 0, 0, -100, fill='black', arrow='last')
-        self.canvas.create_line(0, 0, 100, 0, fill='black', arrow='last')
+        self.axes = [self.canvas.create_line(0, 0, 0, -100 * self.zoomed, fill='black', arrow='last'),
+                     self.canvas.create_line(0, 0, 100 * self.zoomed, 0, fill='black', arrow='last')]
         self.canvas.scan_dragto(mid_x, mid_y, gain=1)
         self._xshifted = mid_x
         self._yshifted = mid_y
@@ -148,16 +173,56 @@ class Gui(tk.Tk):
         self.select_walker.set("Select Walker")
         self.iterations = tk.Scale(self.button_frame, orient="horizontal", length=200, from_=1.0, to=1000.0)
         self.iterations.grid(row=14, column=0, sticky='ew', columnspan=2)
+        self.step_all = tk.BooleanVar()
+        self.fast_steps = tk.BooleanVar()
+        self.check1 = tk.Checkbutton(self.button_frame, text='All Walkers', variable=self.step_all)
+        self.check1.grid(row=15, column=0, sticky='w')
+        self.check2 = tk.Checkbutton(self.button_frame, text='Fast', variable=self.fast_steps)
+        self.check2.grid(row=15, column=1, sticky='w')
         self.button2 = tk.Button(self.button_frame, text='Take Steps', command=self.iterate_walker)
-        self.button2.grid(row=15, column=0, sticky='ew', columnspan=2)
-        ttk.LabelFrame(self.button_frame, height=5).grid(row=16, column=0, sticky='ew', columnspan=2)
+        self.button2.grid(row=16, column=0, sticky='ew', columnspan=2)
+        ttk.LabelFrame(self.button_frame, height=5).grid(row=17, column=0, sticky='ew', columnspan=2)
         self.button3 = tk.Button(self.button_frame, text='Add Wall', command=self.add_wall)
-        self.button3.grid(row=17, column=0, sticky='ew', columnspan=2)
+        self.button3.grid(row=18, column=0, sticky='ew', columnspan=2)
         self.button4 = tk.Button(self.button_frame, text='Add Portal', command=self.add_portal)
-        self.button4.grid(row=18, column=0, sticky='ew', columnspan=2)
-        ttk.LabelFrame(self.button_frame, height=5).grid(row=19, column=0, sticky='ew', columnspan=2)
+        self.button4.grid(row=19, column=0, sticky='ew', columnspan=2)
+        ttk.LabelFrame(self.button_frame, height=5).grid(row=20, column=0, sticky='ew', columnspan=2)
         self.button5 = tk.Button(self.button_frame, text='Open Stats Window', command=self.stats_window)
-        self.button5.grid(row=20, column=0, sticky='ew', columnspan=2)
+        self.button5.grid(row=21, column=0, sticky='ew', columnspan=2)
+
+    def _create_status_bar(self) -> None:
+        """
+        Create the status bar below the canvas, with a checkbox turning the instrumentation (see Instrument) on.
+        """
+        status_frame = tk.Frame(self)
+        status_frame.grid(row=1, column=0, columnspan=3, sticky='ew')
+        self.status = tk.StringVar()
+        tk.Label(status_frame, textvariable=self.status, anchor='w').pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.profiling = tk.BooleanVar()
+        tk.Checkbutton(status_frame, text='Profile', variable=self.profiling,
+                       command=lambda: Instrument.enable(self.profiling.get())).pack(side=tk.RIGHT)
+        self._status_steps = 0
+        self._status_time = time.perf_counter()
+        self.after(STATUS_INTERVAL, self.update_status)
+
+    def update_status(self) -> None:
+        """
+        Show the steps taken per second since the last update, the number of canvas items and the share of steps
+        rejected by walls, and the slowest instrumented sections while profiling.
+        """
+        now = time.perf_counter()
+        steps = sum(walker.stats.iterations for walker in self.walkers)
+        rate = (steps - self._status_steps) / max(now - self._status_time, 1e-9)
+        self._status_steps = steps
+        self._status_time = now
+        attempted = sum(walker.attempted_steps for walker in self.walkers)
+        rejected = sum(walker.rejected_steps for walker in self.walkers)
+        text = 'steps/s: {:,.0f} | canvas items: {:,} | rejection rate: {:.1%}'.format(
+            max(rate, 0), len(self.canvas.find_all()), rejected / attempted if attempted else 0.0)
+        if Instrument.enabled:
+            text += ' | ' + Instrument.summary()
+        self.status.set(text)
+        self.after(STATUS_INTERVAL, self.update_status)
 
     def introduction(self) -> None:
         """
@@ -235,7 +300,7 @@ class Gui(tk.Tk):
         if self.type.get() == 4:
             self._type_4_window()
         else: # creates the walker and adds it to walker lists
-            walker1 = Walker.Walker(self.name.get(), self.type.get(), self.color, True, self)
+            walker1 = Walker.Walker(self.name.get(), self.type.get(), self.color, True, self, storage='compact')
             self.walker_names.append(walker1.get_name())
             self.walkers.append(walker1)
             self.select_walker['values'] = self.walker_names
@@ -245,7 +310,7 @@ class Gui(tk.Tk):
         """
         Allows creation of a walker from the code as opposed to the GUI
         """
-        walker1 = Walker.Walker(name, type, color, graphic, self)
+        walker1 = Walker.Walker(name, type, color, graphic, self, storage='compact')
         self.walker_names.append(walker1.get_name())
         self.walkers.append(walker1)
         self.select_walker['values'] = self.walker_names
@@ -261,31 +326,20 @@ class Gui(tk.Tk):
 
     def iterate_walker(self) -> None:
         """
-        Iterates over the walkers, performing steps at regular intervals.
+        Makes the selected walker (or every walker, with 'All Walkers' checked) take steps. The steps run in
+        frame-sized batches, or as fast as possible with only the final frame drawn when 'Fast' is checked.
         """
         if self.intro:
             messagebox.showinfo("Error", "Skip the intro message")
             return
-        # resets the canvas zoom to avoid scale issues
-        self.zoomed = 1 / self.zoomed
-        self.canvas.scale('all', 0, 0, self.zoomed, self.zoomed)
-        self.zoomed = 1
-
-        def step(walker, delay, i=0):
-            if i < iterations:
-                walker.step()
-                self.after(delay, step, walker, delay, i + 1)
-            if i == iterations - 1:
-                self.iterating = False
+        def done():
+            self.iterating = False
 
         name = self.select_walker.get()
-        iterations = self.iterations.get()
-        delay = int(5000 / iterations)  # make the walker iterate quickly
-        delay = min(delay, 10)
-        for walker in self.walkers:
-            if name == walker.get_name():
-                self.iterating = True
-                step(walker, delay)
+        walkers = [walker for walker in self.walkers if self.step_all.get() or name == walker.get_name()]
+        if walkers:
+            self.iterating = True
+            self.scheduler.start(walkers, self.iterations.get(), fast=self.fast_steps.get(), on_done=done)
 
     def move_all_walkers(self, event) -> None:
         """
@@ -331,19 +385,49 @@ class Gui(tk.Tk):
                     self._recent_drag_point_x = event.x
                     self._recent_drag_point_y = event.y
                     self.canvas.scan_mark(event.x, event.y)
+                    self.renderer.refresh()  # draws the parts of the trajectories that came into view
 
     def _zoom(self, event) -> None:
         """
-        This method is used to perform zooming functionality on the canvas.
-        It scales all the elements on the canvas based on the mouse wheel event.
+        This method is used to perform zooming functionality on the canvas, also while the walkers are stepping.
+        The walls, portals and axes are moved to the new zoom, and the trajectories are redrawn for the new view.
         """
         if not self.intro:
-            if not self.iterating:
-                if str(self.focus_get()) == str(self.canvas):
-                    multiplier = 1.01  # how fast to zoom
-                    factor = multiplier ** event.delta
-                    self.zoomed *= factor
-                    self.canvas.scale('all', 0, 0, factor, factor)
+            if str(self.focus_get()) == str(self.canvas):
+                multiplier = 1.01  # how fast to zoom
+                factor = multiplier ** event.delta
+                self.zoomed *= factor
+                self.redraw_scene()
+                self.renderer.refresh()
+
+    def redraw_scene(self) -> None:
+        """
+        Move the axes, walls and portals to the current zoom, from their unzoomed coordinates in the world.
+        """
+        zoom = self.zoomed
+        if self.axes:
+            self.canvas.coords(self.axes[0], 0, 0, 0, -100 * zoom)
+            self.canvas.coords(self.axes[1], 0, 0, 100 * zoom, 0)
+        for (start, end), key in zip(self.world.walls, self.world.wall_keys):
+            self.canvas.coords(key, start[0] * zoom, start[1] * zoom, end[0] * zoom, end[1] * zoom)
+        r = 5
+        for (start, end), exit, key in zip(self.world.portals, self.world.portal_exits, self.world.portal_keys):
+            self.canvas.coords(key, start[0] * zoom, start[1] * zoom, end[0] * zoom, end[1] * zoom)
+            self.canvas.coords(self.portals[key], exit[0] * zoom - r, exit[1] * zoom - r,
+                               exit[0] * zoom + r, exit[1] * zoom + r)
+
+    def visible_region(self) -> Optional[Tuple[float, float, float, float]]:
+        """
+        :return: The unzoomed (x1, y1, x2, y2) region of the simulation shown on the canvas, with a margin
+        """
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        margin = 50
+        x1 = (self.canvas.canvasx(0) - margin) / self.zoomed
+        y1 = (self.canvas.canvasy(0) - margin) / self.zoomed
+        x2 = (self.canvas.canvasx(width) + margin) / self.zoomed
+        y2 = (self.canvas.canvasy(height) + margin) / self.zoomed
+        return x1, y1, x2, y2
 
     def on_canvas_click(self, event) -> None:
         """
@@ -365,6 +449,7 @@ class Gui(tk.Tk):
                                    event.x - self._xshifted, event.y - self._yshifted)
                 if self.add_wall_active:
                     self.walls.append(self.wall)
+                    self.world.add_wall(self._unzoomed(self.canvas.coords(self.wall)), key=self.wall)
                     self.click_position = (0.0, 0.0)
                     self.wall = 0
                 self.add_wall_active = False
@@ -381,11 +466,19 @@ class Gui(tk.Tk):
             self.canvas.coords(self.oval, event.x - self._xshifted - r, event.y - self._yshifted - r,
                                event.x - self._xshifted + r, event.y - self._yshifted + r)
             self.portals.update({self.wall: self.oval})
+            self.world.add_portal(self._unzoomed(self.canvas.coords(self.wall)),
+                                  self._unzoomed((event.x - self._xshifted, event.y - self._yshifted)), key=self.wall)
             self.click_position = (0.0, 0.0)
             self.add_portal_stage = 0
             self.oval = 0
             self.wall = 0
 
+    def _unzoomed(self, coords: Sequence[float]) -> List[float]:
+        """
+        Convert canvas coordinates to the unzoomed coordinates the walkers step in.
+        """
+        return [value / self.zoomed for value in coords]
+
     def on_canvas_move(self, event) -> None:
         """
         Extends the wall or portal on the canvas based on the event.
@@ -440,6 +533,9 @@ class Gui(tk.Tk):
             try:
                 random.seed(str(seed.get()))
                 self.seed = str(seed.get())
+                # every walker restarts its own stream from the new session seed
+                for walker in self.walkers:
+                    walker.reseed(Seeds.seed_sequence(self.seed, walker.name))
                 new_window.destroy()
             except:
                 messagebox.showinfo("Invalid seed", "Seed Not Set")
@@ -494,7 +590,8 @@ class Gui(tk.Tk):
             else:
                 chances = [p / 100.0 for p in chances]
                 # create the walker with given chances
-                walker1 = Walker.Walker(self.name.get(), self.type.get(), self.color, True, self, chances)
+                walker1 = Walker.Walker(self.name.get(), self.type.get(), self.color, True, self, chances,
+                                        storage='compact')
                 self.walker_names.append(walker1.get_name())
                 self.walkers.append(walker1)
                 self.select_walker['values'] = self.walker_names
@@ -539,12 +636,18 @@ class Gui(tk.Tk):
         """
         selected_walker = tk.StringVar()
         active_walker = self.walkers[0]
+        job: List[Optional[int]] = [None]  # the ensemble being simulated, if any
+        pending: List[Optional[str]] = [None]  # the refresh waiting for the changes to settle, if any
+        lines: Dict[str, Any] = {}  # the line of every statistic, updated in place
+        bands: Dict[str, Any] = {}  # the confidence band of every statistic, once there are copies
+        axes_of: Dict[str, Any] = {}  # the plot every statistic is drawn on
+        dirty: Set[int] = set()  # the tabs whose figure is out of date, drawn when they are shown
 
         def rounded(list: List[float]) -> List[float]:
             """
             Receives a list of numbers and rounds them to the nearest 2 decimal places
             """
-            return [round(val, 2) for val in list]
+            return [round(float(val), 2) for val in list]
 
         def export_graphs() -> None:
             """
@@ -580,27 +683,42 @@ class Gui(tk.Tk):
                         f.write("\n\n")
                         f.write("Average Distance From Center Per Step:")
                         f.write("\n")
-                        f.write(str(rounded(active_walker.averages.av_distance_from_center[self.spinval.get() - 1])))
+                        f.write(str(rounded(active_walker.averages.mean('distance_from_center'))))
                         f.write("\n\n")
                         f.write("Average Distance From Axis Per Step:")
                         f.write("\n")
                         f.write("X axis: ")
-                        f.write(str(rounded(active_walker.averages.av_distance_from_x[self.spinval.get() - 1])))
+                        f.write(str(rounded(active_walker.averages.mean('distance_from_x'))))
                         f.write("\n")
                         f.write("Y axis: ")
-                        f.write(str(rounded(active_walker.averages.av_distance_from_y[self.spinval.get() - 1])))
+                        f.write(str(rounded(active_walker.averages.mean('distance_from_y'))))
                         f.write("\n\n")
                         f.write("Average Radius Crossed At Each Step:")
                         f.write("\n")
-                        f.write(str(rounded(active_walker.averages.av_radius_steps[self.spinval.get() - 1])))
+                        f.write(str(rounded(active_walker.averages.mean('radius_steps'))))
                         f.write("\n\n")
                         f.write("Average # of Times To Cross Axis Per Step:")
                         f.write("\n")
                         f.write("X axis: ")
-                        f.write(str(rounded(active_walker.averages.av_times_crossed_x[self.spinval.get() - 1])))
+                        f.write(str(rounded(active_walker.averages.mean('times_crossed_x'))))
                         f.write("\n")
                         f.write("Y axis: ")
-                        f.write(str(rounded(active_walker.averages.av_times_crossed_y[self.spinval.get() - 1])))
+                        f.write(str(rounded(active_walker.averages.mean('times_crossed_y'))))
+            else:
+                messagebox.showinfo("Error", "Please select a walker to export")
+
+        def export_data() -> None:
+            """
+            Export the statistics and averages of a selected walker, with its seed and obstacles, to an NPZ file
+            """
+            if selected_walker.get():
+                path = filedialog.asksaveasfilename(defaultextension='.npz',
+                                                    initialfile='Data For {}.npz'.format(select_walker2.get()),
+                                                    filetypes=[('NumPy archive', '*.npz')])
+                if path:
+                    for walker in self.walkers:
+                        if walker.get_name() == select_walker2.get():
+                            Export.save_npz(path, walker)
             else:
                 messagebox.showinfo("Error", "Please select a walker to export")
 
@@ -608,73 +726,106 @@ class Gui(tk.Tk):
             """
             Protocol for closing the window
             """
-            # reset averages of all walkers and deletes sub-walkers
+            cancel_copies()
+            if pending[0] is not None:
+                new_window.after_cancel(pending[0])
+            # reset averages of all walkers
             for walker in self.walkers:
-                walker.subwalkers.clear()
-                walker.averages.clear()
-                walker.copies = 1
+                walker.reset_copies()
             new_window.grab_release()
             new_window.destroy()
 
         def update_plots(event=None) -> None:
             """
-            Refresh and update all plots
+            Refresh the plots once the walker and the number of walkers stop changing, so scrolling through the
+            number of walkers only simulates the last one
             """
-            fig1.tight_layout()
-            fig2.tight_layout()
-            fig3.tight_layout()
-            fig4.tight_layout()
-            canvas1.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-            canvas2.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-            canvas3.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-            canvas4.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-            name = select_walker2.get()
+            if pending[0] is not None:
+                new_window.after_cancel(pending[0])
+            pending[0] = new_window.after(PLOT_DEBOUNCE, start_copies)
 
+        def start_copies() -> None:
+            """
+            Simulate the copies of the selected walker in the background, and update the plots once they are done
+            """
+            pending[0] = None
+            name = select_walker2.get()
+            walker = self.walkers[0]
+            for other in self.walkers:
+                if name == other.get_name():
+                    walker = other
             if not name:
-                active_walker = self.walkers[0]
+                selected_walker.set(walker.get_name())
+
+            cancel_copies()
+            first = walker.copies
+            progress['maximum'] = max(self.spinval.get() - first, 1)
+            progress['value'] = 0
+
+            def done() -> None:
+                job[0] = None
+                progress['value'] = progress['maximum']
+                draw_plots()
+
+            job[0] = walker.copy_async(self.spinval.get(), self.worker, workers=os.cpu_count() or 1,
+                                       on_done=done, on_progress=lambda merged: progress.configure(value=merged))
+
+        def cancel_copies() -> None:
+            """
+            Stop simulating copies, leaving the averages as they were
+            """
+            self.worker.cancel(job[0])
+            job[0] = None
+            progress['value'] = 0
+
+        def draw_plots() -> None:
+            """
+            Update the lines of all plots in place, and draw the plot that is shown
+            """
+            name = select_walker2.get()
+
+            active_walker = self.walkers[0]
             for walker in self.walkers:
                 if name == walker.get_name():
                     active_walker = walker
 
-            if not select_walker2.get():
-                selected_walker.set(self.walkers[0].get_name())
-
-            active_walker.copy(self.spinval.get())
-
-            # graph 1
-            y = np.array(active_walker.averages.av_distance_from_center[self.spinval.get() - 1])
-            plot1.clear()
-            plot1.set(xlabel='steps', ylabel='distance from (0,0)', title='Average Distance From Center')
-            plot1.plot(y)
-            canvas1.draw()
-
-            # graph 2
-            y1 = np.array(active_walker.averages.av_distance_from_x[self.spinval.get() - 1])
-            y2 = np.array(active_walker.averages.av_distance_from_y[self.spinval.get() - 1])
-            plot2.clear()
-            plot2.set(xlabel='steps', ylabel='distance', title='Average Distance From Axis')
-            plot2.plot(y1, label='X axis')
-            plot2.plot(y2, label='Y axis')
-            plot2.legend()
-            canvas2.draw()
-
-            # graph 3
-            x = np.array([i for i in range(active_walker.stats.iterations + 1)])
-            y = np.array(active_walker.averages.av_radius_steps[self.spinval.get() - 1])
-            plot3.clear()
-            plot3.set(xlabel='steps', ylabel='radius', title='Average # of Steps To Exit Radius')
-            plot3.plot(x, y)
-            canvas3.draw()
-
-            # graph 4
-            y1 = np.array(active_walker.averages.av_times_crossed_x[self.spinval.get() - 1])
-            y2 = np.array(active_walker.averages.av_times_crossed_y[self.spinval.get() - 1])
-            plot4.clear()
-            plot4.set(xlabel='steps', ylabel='times crossed', title='Average # of Times To Cross Axis')
-            plot4.plot(y1, label='X axis')
-            plot4.plot(y2, label='Y axis')
-            plot4.legend()
-            canvas4.draw()
+            averages = active_walker.averages
+            means = {name: averages.mean(name) for name in lines}
+            # the averages cover the steps the walker had when its copies were simulated, which can be fewer than
+            # it has now if it kept stepping meanwhile
+            x = np.arange(len(next(iter(means.values()))))
+            for name in lines:
+                lines[name].set_data(x, means[name])
+            for plot in (plot1, plot2, plot3, plot4):
+                plot.relim()
+            # after relim, which only looks at the lines, so the new bands still count towards the limits
+            for name in lines:
+                set_band(name, x, averages)
+            for plot in (plot1, plot2, plot3, plot4):
+                plot.autoscale_view()
+            dirty.update(range(len(canvases)))
+            draw_visible()
+
+        def draw_visible(event=None) -> None:
+            """
+            Draw the figure of the tab that is shown if it is out of date
+            """
+            index = n.index(n.select())
+            if index in dirty:
+                dirty.discard(index)
+                canvases[index].draw_idle()
+
+        def set_band(name: str, x, averages) -> None:
+            """
+            Replace the band showing the 95% confidence interval of the average of a statistic, once there are copies
+            """
+            line = lines[name]
+            if name in bands:
+                bands.pop(name).remove()
+            if averages.count > 1:
+                low, high = averages.confidence_interval(name)
+                bands[name] = axes_of[name].fill_between(x, low, high, color=line.get_color(), alpha=0.2,
+                                                         linewidth=0)
 
         def create_figure_and_toolbar(master, xlabel: str, ylabel: str, title: str):
             fig = Figure(figsize=(5, 4), dpi=100)
@@ -695,7 +846,7 @@ class Gui(tk.Tk):
         new_window = tk.Toplevel(self)
         new_window.grab_set()
         new_window.title("Statistics")
-        new_window.geometry("500x600")
+        new_window.geometry("500x640")
         new_window.resizable(False, False)
         n = ttk.Notebook(new_window)
         f1 = ttk.Frame(n, style='Danger.TFrame')
@@ -716,6 +867,10 @@ class Gui(tk.Tk):
         s.set(1)
         tk.Button(new_window, text='Export All Graphs', command=export_graphs).place(x=250, y=505, width=200)
         tk.Button(new_window, text='Export Stats To Text', command=stats_to_text).place(x=250, y=540, width=200)
+        progress = ttk.Progressbar(new_window, orient='horizontal', mode='determinate')
+        progress.place(x=10, y=572, width=330)
+        tk.Button(new_window, text='Cancel', command=cancel_copies).place(x=350, y=570, width=100)
+        tk.Button(new_window, text='Export Data (NPZ)', command=export_data).place(x=250, y=605, width=200)
 
         fig1, canvas1, toolbar1, plot1 = create_figure_and_toolbar(f1, 'steps', 'distance from (0,0)',
                                                                    'Average Distance From Center')
@@ -725,7 +880,19 @@ class Gui(tk.Tk):
                                                                    'Average # of Steps To Exit Radius')
         fig4, canvas4, toolbar4, plot4 = create_figure_and_toolbar(f4, 'steps', 'times crossed',
                                                                    'Average # of Times To Cross Axis')
+        canvases = [canvas1, canvas2, canvas3, canvas4]
+        # the lines are made once, and only their data changes afterwards
+        for plot, statistics in ((plot1, [('distance_from_center', None)]),
+                                 (plot2, [('distance_from_x', 'X axis'), ('distance_from_y', 'Y axis')]),
+                                 (plot3, [('radius_steps', None)]),
+                                 (plot4, [('times_crossed_x', 'X axis'), ('times_crossed_y', 'Y axis')])):
+            for name, label in statistics:
+                lines[name], = plot.plot([], [], label=label)
+                axes_of[name] = plot
+            if len(statistics) > 1:
+                plot.legend()
 
         # bindings
         new_window.bind('<<ComboboxSelected>>', update_plots)
+        n.bind('<<NotebookTabChanged>>', draw_visible)
         new_window.protocol("WM_DELETE_WINDOW", on_closing)
@@ -0,0 +1,78 @@
+import json
+import time
+from typing import *
+
+# True while counters and timers are recorded; the instrumented code checks it first, so it costs almost nothing
+# when off
+enabled = False
+# the number of times every counted event happened
+counters: Dict[str, int] = {}
+# the number of calls and the total seconds of every timed section
+timers: Dict[str, List[float]] = {}
+
+
+def enable(on: bool = True) -> None:
+    """
+    Start (or stop) recording counters and timers.
+    """
+    global enabled
+    enabled = on
+
+
+def reset() -> None:
+    """
+    Forget every counter and timer recorded so far.
+    """
+    counters.clear()
+    timers.clear()
+
+
+def count(name: str, amount: int = 1) -> None:
+    """
+    Add to a counter. Callers check `enabled` first.
+    """
+    counters[name] = counters.get(name, 0) + amount
+
+
+def add_time(name: str, start: float) -> None:
+    """
+    Record a call of a timed section. Callers check `enabled` first.
+
+    :param name: The name of the section
+    :param start: The time.perf_counter() value when the section started
+    """
+    elapsed = time.perf_counter() - start
+    entry = timers.get(name)
+    if entry is None:
+        timers[name] = [1, elapsed]
+    else:
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    :return: The counters, and for every timer its calls, total seconds and mean microseconds per call
+    """
+    return {
+        'counters': dict(counters),
+        'timers': {name: {'calls': int(calls), 'seconds': seconds, 'mean_us': 1e6 * seconds / calls}
+                   for name, (calls, seconds) in timers.items()},
+    }
+
+
+def summary(limit: int = 3) -> str:
+    """
+    :param limit: The number of timers to show
+    :return: The timers taking the most time, with their mean time per call, on one line
+    """
+    slowest = sorted(timers.items(), key=lambda item: -item[1][1])[:limit]
+    return ', '.join('{} {:.1f}us'.format(name, 1e6 * seconds / calls) for name, (calls, seconds) in slowest)
+
+
+def dump(path: str) -> None:
+    """
+    Save the snapshot as JSON, e.g. at the end of a headless run.
+    """
+    with open(path, 'w') as f:
+        json.dump(snapshot(), f, indent=2)
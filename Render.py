@@ -0,0 +1,238 @@
+import math
+import time
+from typing import *
+import Instrument
+
+# the most points a single polyline holds before a new one is started, so extending a path stays cheap
+MAX_POINTS = 512
+# the distance in pixels between the points of a trajectory drawn when zoomed out
+LOD_PIXELS = 2.0
+# the distance in unzoomed units between the points of the first decimated level, each next level doubles it
+LOD_CELL = 5.0
+# the number of decimated levels kept for every trajectory, on top of the full detail one
+LOD_LEVELS = 10
+
+Bounds = Tuple[float, float, float, float]
+
+
+def cell_size(level: int) -> float:
+    """
+    :param level: A decimated level, from 1 to LOD_LEVELS
+    :return: The distance in unzoomed units between the points kept by that level
+    """
+    return LOD_CELL * 2 ** (level - 1)
+
+
+def level_for_zoom(zoom: float) -> int:
+    """
+    :param zoom: The zoom level of the canvas
+    :return: The coarsest level whose points are no more than about LOD_PIXELS apart on screen, or 0 for full
+        detail
+    """
+    if zoom <= 0:
+        return LOD_LEVELS
+    pixel_cell = LOD_PIXELS / zoom
+    if pixel_cell < LOD_CELL:
+        return 0
+    return min(LOD_LEVELS, int(math.log2(pixel_cell / LOD_CELL)) + 1)
+
+
+class Path:
+    """
+    A part of a walker's trajectory that can be drawn as one line, between teleports.
+
+    Besides every point (level 0) it keeps LOD_LEVELS decimated copies: level k only keeps a point if it is at
+    least cell_size(k) away from the point kept before it. Each level is built from the points kept by the level
+    below as they are added, so a point costs O(1) on average whatever the number of levels.
+
+    Attributes:
+    - levels: the points of every level, levels[0] holding every unzoomed (x, y) point
+    - items: the canvas item ids of the polylines the drawn level is split into, None for the ones off screen
+    - bounds: the unzoomed (x1, y1, x2, y2) bounding box of each of those polylines
+    - level: the level currently drawn, or None until it is first drawn
+    - drawn: the number of points of the drawn level that are already on the canvas
+    - pending: True if points were added since the path was last drawn
+    """
+    def __init__(self, start: Tuple[float, float]) -> None:
+        self.levels: List[List[Tuple[float, float]]] = [[start] for i in range(LOD_LEVELS + 1)]
+        self.items: List[Optional[int]] = []
+        self.bounds: List[Bounds] = []
+        self.level: Optional[int] = None
+        self.drawn = 0
+        self.pending = False
+
+    @property
+    def points(self) -> List[Tuple[float, float]]:
+        """
+        :return: Every point of the path
+        """
+        return self.levels[0]
+
+    def append(self, point: Tuple[float, float]) -> None:
+        """
+        Add a point to the full detail level, and to every decimated level it is far enough along in.
+
+        :param point: The unzoomed (x, y) point
+        """
+        self.levels[0].append(point)
+        for level in range(1, LOD_LEVELS + 1):
+            last = self.levels[level][-1]
+            size = cell_size(level)
+            if (point[0] - last[0]) ** 2 + (point[1] - last[1]) ** 2 < size * size:
+                # too close for this level, so the coarser levels do not see the point either
+                break
+            self.levels[level].append(point)
+        self.pending = True
+
+    def view(self, level: int) -> List[Tuple[float, float]]:
+        """
+        :param level: The level to draw
+        :return: The points of that level, ending at the last point of the path
+        """
+        points = self.levels[level]
+        # a polyline needs two points, even when the whole path is shorter than the level's distance
+        if level and (points[-1] != self.levels[0][-1] or len(points) == 1):
+            return points + [self.levels[0][-1]]
+        return points
+
+
+class TrajectoryRenderer:
+    """
+    Draws the walkers' trajectories on the canvas in batches. The segments of a walker are collected into
+    tagged polylines, which are created or extended once per frame, so the number of canvas items grows
+    with the number of walkers (and teleports) instead of the number of steps.
+
+    The paths are kept in unzoomed coordinates and the zoom is applied when they are drawn. When zoomed out,
+    the polylines are drawn from a decimated level of each path, and only the polylines in the visible region of
+    the canvas are drawn at all, so a redraw after zooming or panning costs about as much as the number of pixels
+    on screen rather than the number of steps taken.
+
+    Attributes:
+    - app: the Gui the canvas belongs to
+    - canvas: the Tk canvas to draw on
+    - paths: a dictionary mapping each walker to the paths of its trajectory, the last one being extended
+    - items_created: the number of canvas items created so far
+    - auto_flush: True to draw pending segments whenever Tk is idle, False to wait for an explicit flush
+    """
+    def __init__(self, app) -> None:
+        self.app = app
+        self.canvas = app.canvas
+        self.paths: Dict[Any, List[Path]] = {}
+        self.items_created = 0
+        self.auto_flush = True
+        self._flush_scheduled = False
+        self._view: Optional[Tuple[float, Optional[Bounds]]] = None
+
+    def add_segment(self, walker, start: Tuple[float, float], end: Tuple[float, float]) -> None:
+        """
+        Add a segment to a walker's trajectory. A segment that does not start where the last one ended (after a
+        teleport) starts a new path.
+
+        :param walker: The walker the segment belongs to
+        :param start: The unzoomed (x, y) start of the segment
+        :param end: The unzoomed (x, y) end of the segment
+        """
+        paths = self.paths.setdefault(walker, [])
+        if not paths or paths[-1].points[-1] != start:
+            paths.append(Path(start))
+        paths[-1].append(end)
+        self.request_flush()
+
+    def request_flush(self) -> None:
+        """
+        Draw the pending segments the next time Tk is idle, once for all the segments added until then.
+        """
+        if self.auto_flush and not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.app.after_idle(self.flush)
+
+    def flush(self) -> None:
+        """
+        Draw every pending segment now, and redraw everything in view if the zoom or the visible region changed.
+        """
+        self._flush_scheduled = False
+        start = time.perf_counter() if Instrument.enabled else 0.0
+        zoom = self.app.zoomed
+        region = self.app.visible_region()
+        level = level_for_zoom(zoom)
+        moved = (zoom, region) != self._view
+        self._view = (zoom, region)
+        for walker, paths in self.paths.items():
+            for path in paths:
+                if moved or path.pending or path.level != level:
+                    self._draw(walker, path, level, zoom, region, moved)
+        if start:
+            Instrument.add_time('render.flush', start)
+
+    def refresh(self) -> None:
+        """
+        Redraw the trajectories for the current view the next time Tk is idle, e.g. after zooming or panning.
+        Several view changes before then are drawn once.
+        """
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.app.after_idle(self.flush)
+
+    def _draw(self, walker, path: Path, level: int, zoom: float, region: Optional[Bounds], moved: bool) -> None:
+        if path.level != level:
+            # another level of detail, so the polylines are drawn again from scratch
+            for item in path.items:
+                if item is not None:
+                    self.canvas.delete(item)
+            path.items = []
+            path.bounds = []
+            path.level = level
+            path.drawn = 0
+            moved = True
+        points = path.view(level)
+        count = max(1, math.ceil((len(points) - 1) / (MAX_POINTS - 1)))
+        # the polylines overlap by one point; only the ones holding new points change, unless the view moved
+        changed = max(0, path.drawn - 1) // (MAX_POINTS - 1)
+        del path.bounds[changed:]
+        path.items.extend([None] * (count - len(path.items)))
+        for index in range(0 if moved else changed, count):
+            start = index * (MAX_POINTS - 1)
+            if index >= len(path.bounds):
+                path.bounds.append(self.bounds(points[start:start + MAX_POINTS]))
+            item = path.items[index]
+            if region is None or self.overlaps(path.bounds[index], region):
+                coords = [value * zoom for point in points[start:start + MAX_POINTS] for value in point]
+                if item is None:
+                    path.items[index] = self.canvas.create_line(coords, fill=walker.color,
+                                                                tags=('walker', self.tag(walker)))
+                    self.items_created += 1
+                    if Instrument.enabled:
+                        Instrument.count('canvas.items_created')
+                else:
+                    self.canvas.coords(item, coords)
+                    if Instrument.enabled:
+                        Instrument.count('canvas.items_updated')
+            elif item is not None:
+                # off screen, so it is dropped rather than kept up to date
+                self.canvas.delete(item)
+                path.items[index] = None
+        path.drawn = len(path.levels[level])
+        path.pending = False
+
+    @staticmethod
+    def bounds(points: Sequence[Tuple[float, float]]) -> Bounds:
+        """
+        :return: The (x1, y1, x2, y2) bounding box of the points
+        """
+        xs = [point[0] for point in points]
+        ys = [point[1] for point in points]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    @staticmethod
+    def overlaps(bounds: Bounds, region: Bounds) -> bool:
+        """
+        :return: True if the two (x1, y1, x2, y2) boxes overlap
+        """
+        return bounds[0] <= region[2] and region[0] <= bounds[2] and bounds[1] <= region[3] and region[1] <= bounds[3]
+
+    @staticmethod
+    def tag(walker) -> str:
+        """
+        :return: The canvas tag shared by all the polylines of a walker
+        """
+        return 'walker-{}'.format(id(walker))
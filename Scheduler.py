@@ -0,0 +1,107 @@
+import time
+from typing import *
+
+# the time a tick may spend stepping walkers, in seconds, so the window keeps redrawing at about 60 frames per second
+FRAME_BUDGET = 0.016
+# the time a tick may spend stepping walkers when only the final frame is drawn
+FAST_BUDGET = 0.1
+
+
+class StepScheduler:
+    """
+    Runs walker steps in ticks of the Tk main loop. Each tick takes as many steps as fit in a frame-time budget,
+    based on the measured cost of a step, then lets Tk redraw before the next tick.
+
+    Several walkers can be advanced together: every job (a walker and its remaining steps) gets one step per
+    round, in turn.
+
+    Attributes:
+    - app: the Gui whose main loop runs the ticks
+    - budget: the time in seconds a tick may spend stepping
+    - jobs: a list of [walker, remaining steps] pairs still running
+    - fast: True to run as fast as possible and draw only the final frame
+    - step_cost: the measured average time in seconds of a single walker step
+    - on_done: called when every job is finished (optional)
+    """
+    def __init__(self, app, budget: float = FRAME_BUDGET) -> None:
+        self.app = app
+        self.budget = budget
+        self.jobs: List[List[Any]] = []
+        self.fast = False
+        self.step_cost = 1e-4
+        self.on_done: Optional[Callable[[], None]] = None
+        self._tick_scheduled = False
+
+    def start(self, walkers: Iterable[Any], iterations: int, fast: bool = False,
+              on_done: Optional[Callable[[], None]] = None) -> None:
+        """
+        Schedule every walker to take `iterations` steps. Walkers added while others are still running join them.
+
+        :param walkers: The walkers to advance
+        :param iterations: The number of steps each walker takes
+        :param fast: True to run as fast as possible and only draw the final frame
+        :param on_done: Called when every job is finished (optional)
+        """
+        for walker in walkers:
+            self.jobs.append([walker, iterations])
+        self.fast = fast
+        self.on_done = on_done
+        self.app.renderer.auto_flush = not fast
+        if self.jobs and not self._tick_scheduled:
+            self._tick_scheduled = True
+            self.app.after(1, self._tick)
+
+    def running(self) -> bool:
+        """
+        :return: True while there are steps left to take
+        """
+        return bool(self.jobs)
+
+    def cancel(self) -> None:
+        """
+        Drop every remaining step. What was done so far is drawn and on_done is called, as when the steps finish.
+        """
+        if self.jobs:
+            self.jobs.clear()
+            self._finish()
+
+    def _tick(self) -> None:
+        self._tick_scheduled = False
+        if not self.jobs:  # cancelled since the tick was scheduled
+            return
+        budget = FAST_BUDGET if self.fast else self.budget
+        start = time.perf_counter()
+        deadline = start + budget
+        steps = 0
+        now = start
+        while self.jobs and now < deadline:
+            # as many rounds as should fit in the time left, checked again after each batch
+            rounds = max(1, int((deadline - now) / (self.step_cost * len(self.jobs))))
+            for i in range(rounds):
+                for job in self.jobs:
+                    job[0].step()
+                    job[1] -= 1
+                    steps += 1
+                if any(job[1] <= 0 for job in self.jobs):
+                    self.jobs = [job for job in self.jobs if job[1] > 0]
+                    if not self.jobs:
+                        break
+            now = time.perf_counter()
+        if steps:
+            # a moving average, so the estimate follows changes such as a walker reaching a dense area
+            self.step_cost = 0.7 * self.step_cost + 0.3 * (now - start) / steps
+
+        if self.jobs:
+            if not self.fast:
+                self.app.renderer.flush()
+            self._tick_scheduled = True
+            self.app.after(1, self._tick)
+        else:
+            self._finish()
+
+    def _finish(self) -> None:
+        self.app.renderer.auto_flush = True
+        self.app.renderer.flush()
+        on_done, self.on_done = self.on_done, None
+        if on_done is not None:
+            on_done()
@@ -0,0 +1,33 @@
+import hashlib
+import numpy as np
+from typing import *
+
+
+def seed_sequence(seed: Any, *keys: Any) -> np.random.SeedSequence:
+    """
+    Derive an independent, reproducible seed sequence from the session seed.
+
+    :param seed: The session seed (as shown by 'Get Seed'), compared by its text like random.seed(str(seed))
+    :param keys: Any number of names or indices telling the streams apart, e.g. a walker's name
+    :return: A numpy SeedSequence that is the same every time it is derived from the same seed and keys
+    """
+    return np.random.SeedSequence(to_entropy(str(seed)), spawn_key=tuple(to_entropy(key) for key in keys))
+
+
+def child_sequence(parent: np.random.SeedSequence, index: int) -> np.random.SeedSequence:
+    """
+    :param parent: The seed sequence of a walker
+    :param index: The index of one of the walker's copies
+    :return: The seed sequence of that copy, independent of how many other copies are derived or in which order
+    """
+    return np.random.SeedSequence(parent.entropy, spawn_key=tuple(parent.spawn_key) + (index,))
+
+
+def to_entropy(value: Any) -> int:
+    """
+    :param value: A seed or key; integers are used as they are, anything else is hashed by its text
+    :return: A non-negative integer usable as SeedSequence entropy
+    """
+    if isinstance(value, (int, np.integer)) and value >= 0:
+        return int(value)
+    return int.from_bytes(hashlib.sha256(str(value).encode()).digest()[:16], 'big')
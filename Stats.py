@@ -1,24 +1,194 @@
+import math
+import os
+import tempfile
+import numpy as np
 from typing import *
-import Walker
+
+# the number of rows a disk-backed column grows by at a time
+CHUNK_ROWS = 1 << 20
+
+
+class GrowableArray:
+    """
+    A column of values backed by a numpy buffer that doubles in size when it fills up, so appending is amortized
+    constant time and the values take only the size of their type.
+
+    It behaves like a read-only list (len, indexing, iteration) and can be handed to numpy without copying.
+
+    Attributes:
+    - dtype: the numpy type of the values
+    - width: the number of values in each row, or None for a column of single values
+    """
+    def __init__(self, dtype: Any, width: Optional[int] = None, values: Iterable[Any] = (),
+                 capacity: int = 1024) -> None:
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        shape = (capacity,) if width is None else (capacity, width)
+        self._buffer = np.zeros(shape, dtype=self.dtype)
+        self._length = 0
+        self.extend(values)
+
+    def append(self, value: Any) -> None:
+        """
+        Add a value (or a row of `width` values) at the end of the column.
+        """
+        if self._length == len(self._buffer):
+            self._grow()
+        self._buffer[self._length] = value
+        self._length += 1
+
+    def extend(self, values: Iterable[Any]) -> None:
+        """
+        Add many values (or rows) at the end of the column, copied in one go, e.g. when loading a long run.
+        """
+        values = np.asarray(values if isinstance(values, np.ndarray) else list(values), dtype=self.dtype)
+        while self._length + len(values) > len(self._buffer):
+            self._grow()
+        self._buffer[self._length:self._length + len(values)] = values
+        self._length += len(values)
+
+    def view(self) -> np.ndarray:
+        """
+        :return: A read-only numpy view of the values, without copying them
+        """
+        view = self._buffer[:self._length]
+        view.flags.writeable = False
+        return view
+
+    def tolist(self) -> List[Any]:
+        return self.view().tolist()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: The number of bytes taken by the buffer, including the space reserved for future values
+        """
+        return self._buffer.nbytes
+
+    def _grow(self) -> None:
+        buffer = np.zeros((2 * len(self._buffer),) + self._buffer.shape[1:], dtype=self.dtype)
+        buffer[:self._length] = self._buffer[:self._length]
+        self._buffer = buffer
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: Any) -> Any:
+        return self.view()[index]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.view())
+
+    def __array__(self, dtype: Any = None, copy: Any = None) -> np.ndarray:
+        view = self.view()
+        return view if dtype is None else view.astype(dtype)
+
+
+class MappedArray(GrowableArray):
+    """
+    A column like GrowableArray whose values live in a memory-mapped file instead of the heap, so its length is
+    bounded by the disk. The file grows by chunk_rows rows at a time, and every chunk is flushed to the file as
+    it fills up. Its views are read-only memory maps of the file.
+
+    Attributes:
+    - path: the file holding the values, as raw rows of dtype
+    - chunk_rows: the number of rows the file grows by at a time
+    """
+    def __init__(self, path: str, dtype: Any, width: Optional[int] = None, values: Iterable[Any] = (),
+                 chunk_rows: Optional[int] = None) -> None:
+        self.path = path
+        self.chunk_rows = chunk_rows or CHUNK_ROWS
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        open(path, 'wb').close()
+        self._length = 0
+        self._map(self.chunk_rows)
+        self.extend(values)
+
+    def view(self) -> np.ndarray:
+        """
+        :return: A read-only memory map of the values
+        """
+        view = self._memmap[:self._length]
+        view.flags.writeable = False
+        return view
+
+    def flush(self) -> None:
+        """
+        Write the values still only in memory to the file.
+        """
+        self._memmap.flush()
+
+    def _map(self, rows: int) -> None:
+        row_bytes = self.dtype.itemsize * (self.width or 1)
+        with open(self.path, 'r+b') as f:
+            f.truncate(rows * row_bytes)
+        shape = (rows,) if self.width is None else (rows, self.width)
+        self._memmap = np.memmap(self.path, dtype=self.dtype, mode='r+', shape=shape)
+        # appended to through a plain array over the same memory, which skips the memmap bookkeeping per value
+        self._buffer = self._memmap.view(np.ndarray)
+
+    def _grow(self) -> None:
+        rows = len(self._buffer) + self.chunk_rows
+        self.flush()
+        self._memmap = self._buffer = None
+        self._map(rows)
 
 
 class WalkerStats:
-    def __init__(self) -> None:
+    def __init__(self, storage: str = 'list', directory: Optional[str] = None) -> None:
         """
         Initialize an instance of the class creating initial statistic lists for self (a walker).
+
+        :param storage: How the statistics are stored. 'list' keeps Python lists, 'compact' keeps typed numpy
+            columns (GrowableArray) that take a few bytes per step and can be plotted without copying, 'disk'
+            keeps the same columns in memory-mapped files (MappedArray) for walks longer than the memory.
+        :param directory: The directory of the files of 'disk' storage (defaults to a temporary directory that is
+            removed with the statistics)
         """
         self.iterations = 0
-        self.steps_locations = [(0, 0)]
-        self.distance_from_center = [0]
-        self.distance_from_x = [0]
-        self.distance_from_y = [0]
-        self.radius_steps = [0]
-        self.times_crossed_x = [0]
-        self.times_crossed_y = [0]
+        self.storage = storage
+        if storage in ('compact', 'disk'):
+            if storage == 'disk':
+                if directory is None:
+                    self._directory = tempfile.TemporaryDirectory(prefix='walker-')
+                    directory = self._directory.name
+                os.makedirs(directory, exist_ok=True)
+                self.directory = directory
+
+                def column(name, dtype, width=None, values=(0,)):
+                    return MappedArray(os.path.join(directory, name + '.bin'), dtype, width, values)
+            else:
+                def column(name, dtype, width=None, values=(0,)):
+                    return GrowableArray(dtype, width, values)
+            self.steps_locations = column('steps_locations', np.int32, 2, [(0, 0)])
+            self.distance_from_center = column('distance_from_center', np.float32)
+            self.distance_from_x = column('distance_from_x', np.int32)
+            self.distance_from_y = column('distance_from_y', np.int32)
+            self.radius_steps = column('radius_steps', np.int64)
+            self.times_crossed_x = column('times_crossed_x', np.int32)
+            self.times_crossed_y = column('times_crossed_y', np.int32)
+        elif storage == 'list':
+            self.steps_locations = [(0, 0)]
+            self.distance_from_center = [0]
+            self.distance_from_x = [0]
+            self.distance_from_y = [0]
+            self.radius_steps = [0]
+            self.times_crossed_x = [0]
+            self.times_crossed_y = [0]
+        else:
+            raise ValueError('Unknown storage: {}'.format(storage))
+        # the last radius and crossing counts, kept as plain numbers so updates never read back from the storage
+        self.last_radius_steps = 0
+        self.last_times_crossed_x = 0
+        self.last_times_crossed_y = 0
+        # the sign of the last non-zero x and y coordinates, used to count axis crossings
+        self.last_sign_x = 0
+        self.last_sign_y = 0
 
     def update(self, position: tuple[int, int]) -> None:
         """
-        Updates the statistic lists with the new given position.
+        Updates the statistic lists with the new given position. Every statistic is updated in constant time.
 
         :param position: The new position to update the stats with.
         :type position: tuple
@@ -27,41 +197,75 @@ class WalkerStats:
         self.iterations += 1
         self.steps_locations.append(position)
 
-        self.distance_from_center.append(self.calculate_distance(position, (0, 0)))
+        distance = self.calculate_distance(position, (0, 0))
+        self.distance_from_center.append(distance)
 
         self.distance_from_x.append(abs(position[0]))
         self.distance_from_y.append(abs(position[1]))
 
-        i = 0
-        while self.distance_from_center[-1] > i:
-            i += 1
-        self.radius_steps.append(self.radius_steps[-1] + i)
-
-        if round(self.steps_locations[self.iterations - 1][1] * position[1], 3) < 0:
-            self.times_crossed_x.append(self.times_crossed_x[-1] + 1)
-        elif round(self.steps_locations[self.iterations - 1][1] * position[1], 3) == 0:
-            i = 1
-            while round(self.steps_locations[self.iterations - i][1] * position[1], 3) == 0 and i < len(self.steps_locations) - 1:
-                i += 1
-            if round(self.steps_locations[self.iterations - i][1] * position[1], 3) < 0:
-                self.times_crossed_x.append(self.times_crossed_x[-1] + 1)
-            else:
-                self.times_crossed_x.append(self.times_crossed_x[-1])
-        else:
-            self.times_crossed_x.append(self.times_crossed_x[-1])
-
-        if round(self.steps_locations[self.iterations - 1][0] * position[0], 3) < 0:
-            self.times_crossed_y.append(self.times_crossed_y[-1] + 1)
-        elif round(self.steps_locations[self.iterations - 1][0] * position[0], 3) == 0:
-            i = 1
-            while round(self.steps_locations[self.iterations - i][0] * position[0], 3) == 0 and i < len(self.steps_locations) - 1:
-                i += 1
-            if round(self.steps_locations[self.iterations - i][0] * position[0], 3) < 0:
-                self.times_crossed_y.append(self.times_crossed_y[-1] + 1)
+        # the smallest whole radius containing the position
+        self.last_radius_steps += math.ceil(distance)
+        self.radius_steps.append(self.last_radius_steps)
+
+        # an axis is crossed when a coordinate leaves it to the side opposite to the last non-zero value,
+        # stepping onto the axis itself is not a crossing
+        sign_y = (position[1] > 0) - (position[1] < 0)
+        if sign_y != 0 and sign_y == -self.last_sign_y:
+            self.last_times_crossed_x += 1
+        self.times_crossed_x.append(self.last_times_crossed_x)
+        if sign_y != 0:
+            self.last_sign_y = sign_y
+
+        sign_x = (position[0] > 0) - (position[0] < 0)
+        if sign_x != 0 and sign_x == -self.last_sign_x:
+            self.last_times_crossed_y += 1
+        self.times_crossed_y.append(self.last_times_crossed_y)
+        if sign_x != 0:
+            self.last_sign_x = sign_x
+
+    def flush(self) -> None:
+        """
+        Write the statistics of 'disk' storage still only in memory to their files.
+        """
+        if self.storage == 'disk':
+            for name in COLUMNS:
+                getattr(self, name).flush()
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        :return: A dictionary mapping every name in COLUMNS to the statistic as a numpy array, without copying
+            when the storage is compact
+        """
+        return {name: np.asarray(getattr(self, name)) for name in COLUMNS}
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any], storage: str = 'compact') -> 'WalkerStats':
+        """
+        Rebuild the statistics of a walker from its columns, e.g. as loaded by Export, so it can keep stepping.
+
+        :param columns: A dictionary mapping every name in COLUMNS to the values of the statistic at every step
+        :param storage: How the statistics are stored, see __init__
+        :return: The statistics
+        """
+        stats = cls(storage)
+        for name in COLUMNS:
+            values = np.asarray(columns[name])
+            if storage != 'list':
+                # the columns already hold the starting point
+                getattr(stats, name).extend(values[1:])
+            elif name == 'steps_locations':
+                stats.steps_locations = [tuple(position) for position in values.tolist()]
             else:
-                self.times_crossed_y.append(self.times_crossed_y[-1])
-        else:
-            self.times_crossed_y.append(self.times_crossed_y[-1])
+                setattr(stats, name, values.tolist())
+        stats.iterations = len(stats.radius_steps) - 1
+        stats.last_radius_steps = int(stats.radius_steps[-1])
+        stats.last_times_crossed_x = int(stats.times_crossed_x[-1])
+        stats.last_times_crossed_y = int(stats.times_crossed_y[-1])
+        locations = np.asarray(columns['steps_locations'])
+        for axis, name in ((0, 'last_sign_x'), (1, 'last_sign_y')):
+            nonzero = np.flatnonzero(locations[:, axis])
+            setattr(stats, name, int(np.sign(locations[nonzero[-1], axis])) if len(nonzero) else 0)
+        return stats
 
     def calculate_distance(self, current_position: tuple[float, float], other_position: tuple[float, float]) -> int:
         """
@@ -74,72 +278,162 @@ class WalkerStats:
         return ((current_position[0] - other_position[0]) ** 2 + (
                     current_position[1] - other_position[1]) ** 2) ** 0.5
 
+# names of the per-step statistics that are averaged over a walker's copies
+METRICS = ('distance_from_center', 'distance_from_x', 'distance_from_y', 'radius_steps', 'times_crossed_x',
+           'times_crossed_y')
+# names of every per-step statistic a walker records
+COLUMNS = ('steps_locations',) + METRICS
+
+
 class AverageStats:
     """
     This class is responsible for calculating and updating average statistics of a walker.
 
+    The statistics of the walker and its copies are folded in one at a time (or one block at a time) with
+    Welford's algorithm, keeping only a running mean and sum of squared deviations (M2) per step for every
+    statistic. Memory does not grow with the number of copies.
+
     Attributes:
         walker (Walker): The walker object from which the statistics are calculated.
-        av_distance_from_x (list): A list of average distance from x-axis over time.
-        av_distance_from_y (list): A list of average distance from y-axis over time.
-        av_distance_from_center (list): A list of average distance from the center over time.
-        av_radius_steps (list): A list of average steps taken to reach the radius over time.
-        av_times_crossed_x (list): A list of average times crossed the x-axis over time.
-        av_times_crossed_y (list): A list of average times crossed the y-axis over time.
+        count (int): The number of walkers averaged so far, including the walker itself.
+        means (dict): The running mean of every statistic in METRICS, as an array with one value per step.
+        m2s (dict): The running sum of squared deviations from the mean of every statistic, per step.
 
     Methods:
         __init__(self, walker):
             Initializes a new instance of the AverageStats class.
 
             Args:
-                walker (Walker): The walker object from which the statistics are calculated.
+                walker (Walker): The walker object from which the statistics are calculated. Without a walker
+                    the averages start empty, which is how blocks of copies are averaged on their own.
 
-        update(self, sub_walker, copies):
+        update(self, sub_walker):
             Updates the average statistics based on a new sub_walker object.
 
             Args:
                 sub_walker (Walker): The sub_walker object containing the statistics.
-                copies (int): The number of copies of sub_walker in the current update cycle.
+
+        update_batch(self, metrics):
+            Updates the average statistics with a block of sub-walkers simulated in bulk.
+
+            Args:
+                metrics (dict): The statistics of the block, as arrays of shape (sub-walkers, steps).
+
+        merge(self, count, means, m2s):
+            Folds in the running statistics of another group of walkers.
+
+        mean(self, name), variance(self, name), confidence_interval(self, name, z):
+            The average, sample variance and confidence interval of a statistic at every step.
 
         clear(self):
             Clears the average statistics, resetting them to the initial walker statistics.
     """
-    def __init__(self, walker) -> None:
+    def __init__(self, walker=None) -> None:
         self.walker = walker
-        self.walker_stats = walker.stats
-        self.av_distance_from_x = [self.walker_stats.distance_from_x]
-        self.av_distance_from_y = [self.walker_stats.distance_from_y]
-        self.av_distance_from_center = [self.walker_stats.distance_from_center]
-        self.av_radius_steps = [self.walker_stats.radius_steps]
-        self.av_times_crossed_x = [self.walker_stats.times_crossed_x]
-        self.av_times_crossed_y = [self.walker_stats.times_crossed_y]
-
-    def update(self, sub_walker, copies: int) -> None:
-        list1 = []
-        list2 = []
-        list3 = []
-        list4 = []
-        list5 = []
-        list6 = []
-        sub_walker_stats = sub_walker.stats
-        for i in range(len(sub_walker_stats.distance_from_center)):
-            list1.append(round((sub_walker_stats.distance_from_center[i] + (self.av_distance_from_center[-1][i] * copies)) / (copies + 1), 4))
-            list2.append(round((sub_walker_stats.distance_from_x[i] + (self.av_distance_from_x[-1][i] * copies)) / (copies + 1), 4))
-            list3.append(round((sub_walker_stats.distance_from_y[i] + (self.av_distance_from_y[-1][i] * copies)) / (copies + 1), 4))
-            list4.append(round((sub_walker_stats.times_crossed_x[i] + (self.av_times_crossed_x[-1][i] * copies)) / (copies + 1), 4))
-            list5.append(round((sub_walker_stats.times_crossed_y[i] + (self.av_times_crossed_y[-1][i] * copies)) / (copies + 1), 4))
-            list6.append(round((sub_walker_stats.radius_steps[i] + (self.av_radius_steps[-1][i] * copies)) / (copies + 1), 4))
-        self.av_distance_from_center.append(list1)
-        self.av_distance_from_x.append(list2)
-        self.av_distance_from_y.append(list3)
-        self.av_times_crossed_x.append(list4)
-        self.av_times_crossed_y.append(list5)
-        self.av_radius_steps.append(list6)
+        self.walker_stats = walker.stats if walker is not None else None
+        self.clear()
+
+    @property
+    def steps(self) -> int:
+        """
+        :return: The number of steps (including the starting point) the averages cover
+        """
+        return len(self.means[METRICS[0]]) if self.count else 0
+
+    def update(self, sub_walker) -> None:
+        """
+        Fold the statistics of a single walker into the averages.
+
+        :param sub_walker: The walker whose statistics are added
+        :return: None
+        """
+        self.add(sub_walker.stats)
+
+    def add(self, stats: WalkerStats) -> None:
+        """
+        Fold a single set of walker statistics into the averages.
+
+        :param stats: The statistics to add
+        :return: None
+        """
+        self.update_batch({name: np.asarray(getattr(stats, name), dtype=float).reshape(1, -1) for name in METRICS})
+
+    def update_batch(self, metrics: Dict[str, Any]) -> None:
+        """
+        Updates the average statistics with a whole block of sub-walkers at once, as produced by
+        Ensemble.positions_to_stats.
+
+        :param metrics: A dictionary mapping statistic names to arrays of shape (sub-walkers, steps)
+        :return: None
+        """
+        count = 0
+        means = {}
+        m2s = {}
+        for name in METRICS:
+            values = np.asarray(metrics[name], dtype=float)
+            count = len(values)
+            means[name] = values.mean(axis=0)
+            m2s[name] = ((values - means[name]) ** 2).sum(axis=0)
+        self.merge(count, means, m2s)
+
+    def merge(self, count: int, means: Dict[str, np.ndarray], m2s: Dict[str, np.ndarray]) -> None:
+        """
+        Fold in the running statistics of another group of walkers (Chan et al.'s parallel form of Welford's
+        algorithm).
+
+        :param count: The number of walkers in the other group
+        :param means: The mean of every statistic of the other group, per step
+        :param m2s: The sum of squared deviations of every statistic of the other group, per step
+        :return: None
+        """
+        if count == 0:
+            return
+        if self.count == 0:
+            self.means = {name: np.array(means[name], dtype=float) for name in METRICS}
+            self.m2s = {name: np.array(m2s[name], dtype=float) for name in METRICS}
+            self.count = count
+            return
+        total = self.count + count
+        for name in METRICS:
+            delta = means[name] - self.means[name]
+            self.means[name] += delta * (count / total)
+            self.m2s[name] += m2s[name] + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    def mean(self, name: str) -> np.ndarray:
+        """
+        :param name: The name of a statistic in METRICS
+        :return: The average of the statistic at every step
+        """
+        if self.count == 0:
+            return np.asarray(getattr(self.walker_stats, name), dtype=float)
+        return self.means[name]
+
+    def variance(self, name: str) -> np.ndarray:
+        """
+        :param name: The name of a statistic in METRICS
+        :return: The sample variance of the statistic at every step (zero while there is a single walker)
+        """
+        if self.count < 2:
+            return np.zeros_like(self.mean(name))
+        return self.m2s[name] / (self.count - 1)
+
+    def confidence_interval(self, name: str, z: float = 1.96) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param name: The name of a statistic in METRICS
+        :param z: The number of standard errors on each side (1.96 for a 95% interval)
+        :return: The lower and upper bounds of the confidence interval of the average at every step
+        """
+        mean = self.mean(name)
+        margin = z * np.sqrt(self.variance(name) / max(self.count, 1))
+        return mean - margin, mean + margin
 
     def clear(self) -> None:
-        self.av_distance_from_x = [self.walker_stats.distance_from_x]
-        self.av_distance_from_y = [self.walker_stats.distance_from_y]
-        self.av_distance_from_center = [self.walker_stats.distance_from_center]
-        self.av_radius_steps = [self.walker_stats.radius_steps]
-        self.av_times_crossed_x = [self.walker_stats.times_crossed_x]
-        self.av_times_crossed_y = [self.walker_stats.times_crossed_y]
+        """
+        Reset the averages to the statistics of the walker alone (or to nothing when there is no walker).
+        """
+        self.count = 0
+        self.means: Dict[str, np.ndarray] = {}
+        self.m2s: Dict[str, np.ndarray] = {}
+        if self.walker_stats is not None:
+            self.add(self.walker_stats)
@@ -0,0 +1,235 @@
+import os
+import numpy as np
+from typing import *
+import Ensemble
+from Stats import METRICS, GrowableArray, WalkerStats
+
+# the number of steps in a chunk unless asked otherwise
+CHUNK_STEPS = 4096
+# the bytes of a position in the files of PositionWriter
+POSITION_BYTES = 16
+# the types the metrics are recorded as, the same as the compact storage of WalkerStats
+METRIC_TYPES = {
+    'distance_from_center': np.float32,
+    'distance_from_x': np.int32,
+    'distance_from_y': np.int32,
+    'radius_steps': np.int64,
+    'times_crossed_x': np.int32,
+    'times_crossed_y': np.int32,
+}
+
+
+class StepChunk:
+    """
+    A chunk of consecutive steps of a walker, as yielded by Walker.iter_steps.
+
+    Attributes:
+    - first: the number of the first step of the chunk, counting from 1 at the start of the iteration
+    - positions: an array of shape (steps, 2) of the walker's position after every step
+    - segments: an array of shape (segments, 4) of the (x1, y1, x2, y2) line segments the steps draw, or None if
+      they were not collected. A step through a portal draws two segments, a step into a corner none.
+    """
+    def __init__(self, first: int, positions: np.ndarray, segments: Optional[np.ndarray] = None) -> None:
+        self.first = first
+        self.positions = positions
+        self.segments = segments
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+
+class Consumer:
+    """
+    Something that takes the chunks of a walker's steps, see run. Subclasses override consume, and close if they
+    hold resources.
+
+    Attributes:
+    - needs_segments: True if the consumer reads the segments of the chunks, which are only collected then
+    """
+    needs_segments = False
+
+    def consume(self, chunk: StepChunk) -> None:
+        """
+        :param chunk: The next chunk of steps
+        """
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """
+        Make everything consumed so far durable. Called before a checkpoint is saved, so the checkpoint never
+        gets ahead of what the consumer wrote.
+        """
+
+    def close(self) -> None:
+        """
+        Called once the last chunk is consumed, or the walk stopped early.
+        """
+
+
+def run(walker, steps: int, consumers: Sequence[Consumer], chunk: int = CHUNK_STEPS) -> None:
+    """
+    Take steps with a walker and hand every chunk of them to each consumer in turn, in order, then close the
+    consumers. Only the consumers given do any work, e.g. a headless run without a RenderConsumer draws nothing.
+
+    :param walker: The walker to step
+    :param steps: The number of steps to take
+    :param consumers: The consumers of the steps
+    :param chunk: The most steps in a chunk
+    """
+    segments = any(consumer.needs_segments for consumer in consumers)
+    try:
+        for step_chunk in walker.iter_steps(steps, chunk, segments):
+            for consumer in consumers:
+                consumer.consume(step_chunk)
+    finally:
+        for consumer in consumers:
+            consumer.close()
+
+
+class StatsRecorder(Consumer):
+    """
+    Records the steps in a WalkerStats, exactly as Walker.step does. Subscribe it with the walker's own stats to
+    keep them up to date while streaming.
+
+    Attributes:
+    - stats: the statistics updated
+    """
+    def __init__(self, stats: WalkerStats) -> None:
+        self.stats = stats
+
+    def consume(self, chunk: StepChunk) -> None:
+        update = self.stats.update
+        for x, y in chunk.positions.tolist():
+            update((int(x), int(y)))
+
+
+class MetricsRecorder(Consumer):
+    """
+    Records only some of the statistics of WalkerStats, computed a whole chunk at a time. The values are the same
+    as WalkerStats', including the starting point at step 0.
+
+    Attributes:
+    - metrics: the names of the statistics recorded, from METRICS
+    - values: a dictionary mapping every recorded name to its values, one per step
+    """
+    def __init__(self, metrics: Iterable[str] = METRICS) -> None:
+        self.metrics = tuple(metrics)
+        unknown = set(self.metrics) - set(METRICS)
+        if unknown:
+            raise ValueError('Unknown metrics: {}'.format(', '.join(sorted(unknown))))
+        self.values = {name: GrowableArray(METRIC_TYPES[name], values=(0,)) for name in self.metrics}
+        # what the next chunk continues from: the running radius, crossing counts and last non-zero signs
+        self._radius_steps = 0
+        self._crossings = {'times_crossed_x': 0, 'times_crossed_y': 0}
+        self._last_signs = {'times_crossed_x': 0, 'times_crossed_y': 0}
+
+    def consume(self, chunk: StepChunk) -> None:
+        cells = np.trunc(chunk.positions).astype(np.int64)
+        x = cells[:, 0]
+        y = cells[:, 1]
+        needed = set(self.metrics)
+        if needed & {'distance_from_center', 'radius_steps'}:
+            distance = np.sqrt(x * x + y * y)
+            if 'distance_from_center' in needed:
+                self.values['distance_from_center'].extend(distance)
+            if 'radius_steps' in needed:
+                radius_steps = self._radius_steps + np.cumsum(np.ceil(distance)).astype(np.int64)
+                if len(radius_steps):
+                    self._radius_steps = int(radius_steps[-1])
+                self.values['radius_steps'].extend(radius_steps)
+        if 'distance_from_x' in needed:
+            self.values['distance_from_x'].extend(np.abs(x))
+        if 'distance_from_y' in needed:
+            self.values['distance_from_y'].extend(np.abs(y))
+        # crossing the x axis is a change of sign of y, and the other way around
+        for name, coordinates in (('times_crossed_x', y), ('times_crossed_y', x)):
+            if name in needed:
+                self.values[name].extend(self._count_crossings(name, coordinates))
+
+    def _count_crossings(self, name: str, coordinates: np.ndarray) -> np.ndarray:
+        # the last non-zero sign of the previous chunks goes first, so crossings back over the axis are counted
+        values = np.concatenate([[self._last_signs[name]], coordinates]).reshape(1, -1)
+        crossings = self._crossings[name] + Ensemble.count_crossings(values)[0, 1:]
+        nonzero = np.flatnonzero(values[0])
+        if len(nonzero):
+            self._last_signs[name] = int(np.sign(values[0, nonzero[-1]]))
+        if len(crossings):
+            self._crossings[name] = int(crossings[-1])
+        return crossings
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        :return: A dictionary mapping every recorded name to its values as a numpy array, without copying
+        """
+        return {name: np.asarray(values) for name, values in self.values.items()}
+
+
+class RenderConsumer(Consumer):
+    """
+    Draws the steps of a walker on the canvas of an app, through its Renderer.
+
+    Attributes:
+    - walker: the walker the steps belong to, whose path they extend
+    - renderer: the Renderer drawing them
+    """
+    needs_segments = True
+
+    def __init__(self, walker, renderer) -> None:
+        self.walker = walker
+        self.renderer = renderer
+
+    def consume(self, chunk: StepChunk) -> None:
+        for x1, y1, x2, y2 in chunk.segments.tolist():
+            self.renderer.add_segment(self.walker, (x1, y1), (x2, y2))
+
+
+class PositionWriter(Consumer):
+    """
+    Appends the positions of the steps to a file as they come, so a walk longer than the memory can be kept
+    whole. The file holds raw little-endian float64 (x, y) rows, read back with load_positions.
+
+    Attributes:
+    - path: the file written
+    - rows: the number of positions in the file so far
+    """
+    def __init__(self, path: str, start: int = 0) -> None:
+        """
+        :param path: The file to write
+        :param start: The number of positions of the file to keep, to continue it when a walk is resumed from a
+            checkpoint after that many steps. Any positions after them are dropped.
+        """
+        self.path = path
+        self.rows = start
+        if start == 0:
+            self._file = open(path, 'wb')
+            return
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < start * POSITION_BYTES:
+            raise ValueError('{} holds {:,} positions, not the {:,} to continue from'.format(
+                path, size // POSITION_BYTES, start))
+        self._file = open(path, 'ab')
+        self._file.truncate(start * POSITION_BYTES)
+
+    def consume(self, chunk: StepChunk) -> None:
+        self._file.write(np.ascontiguousarray(chunk.positions, dtype='<f8').tobytes())
+        self.rows += len(chunk)
+
+    def flush(self) -> None:
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def load_positions(path: str, mmap: bool = True) -> np.ndarray:
+    """
+    :param path: A file written by PositionWriter
+    :param mmap: True to memory-map the file rather than read it
+    :return: An array of shape (steps, 2) of the positions
+    """
+    if mmap and os.path.getsize(path) > 0:
+        return np.memmap(path, dtype='<f8', mode='r').reshape(-1, 2)
+    return np.fromfile(path, dtype='<f8').reshape(-1, 2)
@@ -1,10 +1,29 @@
+import bisect
+import copy
+import itertools
 import math
-import random
+import time
+import numpy as np
+import Cache
+import Ensemble
+import Instrument
+import Seeds
+import Stream
+from Ensemble import TYPE_4_DIRECTIONS
+from World import World
 from Stats import WalkerStats, AverageStats
 from typing import *
 
+# the number of rejected steps in a row before sampling only among the moves that do not hit a wall
+MAX_REJECTIONS = 8
+# the number of random numbers a walker draws from its generator at a time
+RANDOM_BLOCK = 1024
+
+
 class Walker:
-    def __init__(self, name: str, type: int, color, graphic: bool, app=None, chances=None, is_sub=False) -> None:
+    def __init__(self, name: str, type: int, color, graphic: bool, app=None, chances=None, is_sub=False,
+                 world: Optional[World] = None, storage: str = 'list',
+                 seed: Optional[np.random.SeedSequence] = None) -> None:
         """
         :param name: The name of the walker
         :param type: The type of the walker
@@ -13,11 +32,18 @@ class Walker:
         :param app: The application object (optional)
         :param chances: The list of chances (optional)
         :param is_sub: Flag indicating if the object is a subwalker (default False)
+        :param world: The obstacles the walker can run into (optional, defaults to the world of `app`)
+        :param storage: How the walker's statistics are stored, 'list', 'compact' or 'disk' (see WalkerStats)
+        :param seed: The seed sequence the walker and its copies draw from (optional, see Seeds). Without it the
+            seed is derived from the session seed of `app` and the walker's name, or is fresh without an app.
 
         This method initializes the object with the given parameters. If the `chances` parameter is not provided, an empty list will be used.
         The `name`, `type`, `color`, `graphic`, and `app` attributes will be set to the corresponding parameter values.
         If the `app` parameter is not None, the `myCanvas` attribute will be set to `app.canvas`.
-        The `lastx`, `lasty`, `intersection`, `stats`, `copies`, and `subwalkers` attributes are initialized with default values.
+        If `world` is not given, the walker uses `app.world`, or an empty world when running without an app.
+        The `lastx`, `lasty`, `intersection`, `stats`, and `copies` attributes are initialized with default values.
+        The `attempted_steps`, `rejected_steps` and `stuck_steps` counters keep track of how often steps hit a wall.
+        Each walker draws from its own numpy generator `rng`, so walkers never change each other's paths.
         If `is_sub` is set to False, the `averages` attribute is initialized with an instance of the `AverageStats` class.
         """
         if chances is None:
@@ -27,15 +53,26 @@ class Walker:
         self.color = color
         self.app = app
         self.chances = chances
-        self.graphic = graphic
+        # cumulative chances of the four fixed directions, anything above the last one goes towards (0,0)
+        self.cum_chances = list(itertools.accumulate(chances[:len(TYPE_4_DIRECTIONS)]))
+        # a walker can only be drawn when it belongs to an app with a canvas
+        self.graphic = graphic and app is not None
         if app is not None:
             self.myCanvas = app.canvas
+        if world is None:
+            world = app.world if app is not None else World()
+        self.world = world
+        if seed is None:
+            seed = Seeds.seed_sequence(app.seed, name) if app is not None else np.random.SeedSequence()
+        self.reseed(seed)
         self.lastx = 0.0
         self.lasty = 0.0
         self.intersection = False
-        self.stats = WalkerStats()
+        self.attempted_steps = 0
+        self.rejected_steps = 0
+        self.stuck_steps = 0
+        self.stats = WalkerStats(storage)
         self.copies = 1
-        self.subwalkers: List[Walker] = []
         if not is_sub:
             self.averages = AverageStats(self)
 
@@ -50,77 +87,243 @@ class Walker:
         This method performs a step in the simulation. It calculates the end coordinates based on the current position, direction, and distance. It checks for intersections with walls and portals
         * and adjusts the distance if needed. It then updates the last coordinates and the statistics.
 
+        A step that would hit a wall is rejected and sampled again. After MAX_REJECTIONS rejections in a row the
+        walker stops guessing and samples directly from the moves that do not hit a wall. If there are none, the
+        walker stays where it is for this step.
+
         :param self: The instance of the class.
         :return: None
         """
+        if Instrument.enabled:
+            start = time.perf_counter()
+            self._take_step()
+            Instrument.add_time('walker.step', start)
+        else:
+            self._take_step()
+
+    def _take_step(self) -> None:
+        segments = [] if self.graphic else None
+        self._move(segments)
+        if segments:
+            for segment in segments:
+                self.app.renderer.add_segment(self, *segment)
+        if Instrument.enabled:
+            start = time.perf_counter()
+            self.stats.update((int(self.lastx), int(self.lasty)))
+            Instrument.add_time('stats.update', start)
+        else:
+            self.stats.update((int(self.lastx), int(self.lasty)))
+
+    def iter_steps(self, steps: int, chunk: int = Stream.CHUNK_STEPS,
+                   segments: bool = False) -> Iterator[Stream.StepChunk]:
+        """
+        Take steps lazily, a chunk at a time. Unlike step, nothing is drawn or recorded: the walker only moves, and
+        every chunk of positions is handed to whoever iterates, e.g. the consumers of Stream.run. The walker's own
+        statistics are left alone unless a Stream.StatsRecorder of them consumes the chunks.
+
+        :param steps: The number of steps to take
+        :param chunk: The most steps in a chunk
+        :param segments: True to also collect the line segments the steps would draw (for a Stream.RenderConsumer)
+        :return: An iterator of chunks, the walker having taken the steps of a chunk when it is yielded
+        """
+        first = 1
+        while first <= steps:
+            size = min(chunk, steps - first + 1)
+            drawn = [] if segments else None
+            positions = []
+            start = time.perf_counter() if Instrument.enabled else 0.0
+            for i in range(size):
+                self._move(drawn)
+                positions.append((self.lastx, self.lasty))
+            if start:
+                Instrument.add_time('walker.iter_steps_chunk', start)
+            yield Stream.StepChunk(first, np.array(positions, dtype=float).reshape(-1, 2),
+                                   np.array(drawn, dtype=float).reshape(-1, 4) if segments else None)
+            first += size
+
+    def _move(self, segments: Optional[List[Tuple[Tuple[float, float], Tuple[float, float]]]]) -> None:
+        """
+        Move the walker by one step, without recording it.
+
+        :param segments: A list to add the (start, end) line segments the step draws to, or None
+        """
         self.intersection = False
+        rejections = 0
+        while True:
+            if rejections < MAX_REJECTIONS:
+                direction, distance = self.sample_move()
+            else:
+                move = self.sample_admissible_move()
+                if move is None:  # boxed in, stay in place
+                    self.stuck_steps += 1
+                    return
+                direction, distance = move
+            self.attempted_steps += 1
+            end_x, end_y = self.calculate_end_coordinates(self.lastx, self.lasty, direction, distance)
+            line_coords = ((self.lastx, self.lasty), (end_x, end_y))
+            # check if we will hit a wall in this step
+            if self.obstacle_intersection('wall', line_coords) is None:
+                break
+            self.intersection = True
+            self.rejected_steps += 1
+            rejections += 1
+            if Instrument.enabled:
+                Instrument.count('walker.wall_rejections')
+
+        portal = self.obstacle_intersection('portal', line_coords)
+        # check if we will hit a portal in this step
+        if portal is not None:
+            start = time.perf_counter() if Instrument.enabled else 0.0
+            if start:
+                Instrument.count('walker.portal_teleports')
+            obstacle_coords = self.world.portals[portal]
+            # shortens the line so it ends where it meets the portal
+            distance *= self.intersection_parameter(obstacle_coords, line_coords) or 0.0
+            end_x, end_y = self.calculate_end_coordinates(self.lastx, self.lasty, direction, distance)
+            line_coords = ((self.lastx, self.lasty), (end_x, end_y))
+            if segments is not None:
+                segments.append(line_coords)
+            # transport the line
+            center_x, center_y = self.world.portal_exits[portal]
+            end_x, end_y = self.calculate_end_coordinates(center_x, center_y, direction, distance)
+            line_coords = ((center_x, center_y), (end_x, end_y))
+            if start:
+                Instrument.add_time('walker.portal_clip', start)
+        if segments is not None:
+            segments.append(line_coords)
+        self.lastx = end_x
+        self.lasty = end_y
+
+    def sample_move(self) -> Tuple[float, float]:
+        """
+        Sample the direction and distance of the next step according to the type of the walker.
+
+        :return: The direction in degrees and the distance of the step
+        """
         direction = 0.0
         distance = 10.0
         if self.type == 1 or self.type == 2 or self.type == 3:
             if self.type == 2:
-                distance *= random.uniform(0.5, 1.5)
+                distance *= 0.5 + self.uniform()
             if self.type == 3:
-                direction = random.randrange(0, 360, 90)
-            else:  # type == 1
-                direction = random.randint(0, 360)
+                direction = int(self.uniform() * 4) * 90
+            else:  # type == 1, a whole number of degrees between 0 and 360
+                direction = min(int(self.uniform() * 361), 360)
         elif self.type == 4:
-            # We create a list with the difference between each element being the chance percentage
-            cum_percentages = [sum(self.chances[:i + 1]) for i in range(len(self.chances))]
-            # get a random number between 0.00 and 1.00
-            rand_num = random.random()
-            if rand_num < cum_percentages[0]:
-                direction = 180
-            elif rand_num < cum_percentages[1]:
-                direction = 0
-            elif rand_num < cum_percentages[2]:
-                direction = 270
-            elif rand_num < cum_percentages[3]:
-                direction = 90
+            # the number of cumulative chances below a random number between 0.00 and 1.00 picks the direction
+            choice = bisect.bisect_right(self.cum_chances, self.uniform())
+            if choice < len(TYPE_4_DIRECTIONS):
+                direction = TYPE_4_DIRECTIONS[choice]
             else:
                 direction = self.calculate_angle_to_center(self.lastx, self.lasty)
-        end_x, end_y = self.calculate_end_coordinates(self.lastx, self.lasty, direction, distance)
-        line_coords = ((self.lastx, self.lasty), (end_x, end_y))
-        # check if we will hit a wall in this step
-        if self.obstacle_intersection('wall', line_coords) is None:
-            portal = self.obstacle_intersection('portal', line_coords)
-            # check if we will hit a portal in this step
-            if portal is not None:
-                obstacle_coords = self.app.canvas.coords(portal)
-                obstacle_coords = ((obstacle_coords[0], obstacle_coords[1]), (obstacle_coords[2], obstacle_coords[3]))
-                intersects = True
-                while intersects and distance > 0:  # shortens the line until it doesn't intersect the portal
-                    distance -= 0.01
-                    end_x, end_y = self.calculate_end_coordinates(self.lastx, self.lasty, direction, distance)
-                    line_coords = ((self.lastx, self.lasty), (end_x, end_y))
-                    intersects = self.intersects(obstacle_coords, line_coords)
-                if self.graphic:
-                    self.myCanvas.create_line(line_coords, fill=self.color)
-                # transport the line
-                circle_coords = self.app.canvas.coords(self.app.portals[portal])
-                center_x = (circle_coords[0] + circle_coords[2]) / 2
-                center_y = (circle_coords[1] + circle_coords[3]) / 2
-                end_x, end_y = self.calculate_end_coordinates(center_x, center_y, direction, distance)
-            if self.graphic:
-                self.myCanvas.create_line(line_coords, fill=self.color)
-            self.lastx = end_x
-            self.lasty = end_y
-            self.stats.update((int(end_x), int(end_y)))
+        return direction, distance
+
+    def reseed(self, seed: np.random.SeedSequence) -> None:
+        """
+        Restart the walker's random stream (and the seeds of its copies) from a seed sequence.
+
+        :param seed: The new seed sequence, see Seeds.seed_sequence
+        """
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self._uniforms: List[float] = []
+        self._next_uniform = 0
+
+    def random_state(self) -> Dict[str, Any]:
+        """
+        :return: The state of the walker's random stream: the state of its generator and the numbers drawn but not
+            used yet, enough to continue the stream exactly where it is (see set_random_state)
+        """
+        return {'bit_generator': self.rng.bit_generator.state, 'uniforms': self._uniforms[self._next_uniform:]}
+
+    def set_random_state(self, state: Dict[str, Any]) -> None:
+        """
+        Continue the walker's random stream from a state returned by random_state.
+        """
+        self.rng.bit_generator.state = state['bit_generator']
+        self._uniforms = [float(value) for value in state['uniforms']]
+        self._next_uniform = 0
+
+    def uniform(self) -> float:
+        """
+        :return: The next random number between 0 and 1 of the walker's stream. The numbers are drawn from the
+            generator RANDOM_BLOCK at a time.
+        """
+        if self._next_uniform == len(self._uniforms):
+            self._uniforms = self.rng.random(RANDOM_BLOCK).tolist()
+            self._next_uniform = 0
+        value = self._uniforms[self._next_uniform]
+        self._next_uniform += 1
+        return value
+
+    def draw_uniforms(self, count: int) -> np.ndarray:
+        """
+        :param count: The number of random numbers to draw
+        :return: The next `count` random numbers between 0 and 1 of the walker's stream, the same numbers
+            `count` calls to `uniform` would return
+        """
+        buffered = self._uniforms[self._next_uniform:self._next_uniform + count]
+        self._next_uniform += len(buffered)
+        return np.concatenate([np.array(buffered, dtype=float), self.rng.random(count - len(buffered))])
+
+    def sample_admissible_move(self) -> Optional[Tuple[float, float]]:
+        """
+        Sample the next step only among the moves that do not hit a wall, keeping the relative chances of the
+        walker's type: every whole degree for types 1 and 2 (at a freshly sampled distance for type 2), the four
+        lattice moves for type 3, and the four directions plus the direction of (0,0) weighted by the chances for type 4.
+
+        :return: The direction in degrees and the distance of the step, or None if every move hits a wall
+        """
+        distance = 10.0
+        if self.type == 1 or self.type == 2:
+            if self.type == 2:
+                distance *= 0.5 + self.uniform()
+            moves = [(direction, 1.0) for direction in range(0, 361)]
+        elif self.type == 3:
+            moves = [(direction, 1.0) for direction in range(0, 360, 90)]
         else:
-            self.step()
+            weights = list(self.chances[:4]) + [max(1.0 - sum(self.chances[:4]), 0.0)]
+            directions = list(TYPE_4_DIRECTIONS) + [self.calculate_angle_to_center(self.lastx, self.lasty)]
+            moves = list(zip(directions, weights))
+        admissible = []
+        weights = []
+        for direction, weight in moves:
+            if weight <= 0:
+                continue
+            end_x, end_y = self.calculate_end_coordinates(self.lastx, self.lasty, direction, distance)
+            if self.obstacle_intersection('wall', ((self.lastx, self.lasty), (end_x, end_y))) is None:
+                admissible.append(direction)
+                weights.append(weight)
+        if not admissible:
+            return None
+        cum_weights = list(itertools.accumulate(weights))
+        choice = bisect.bisect_right(cum_weights, self.uniform() * cum_weights[-1])
+        return admissible[min(choice, len(admissible) - 1)], distance
 
-    def obstacle_intersection(self, obstacle: str, line_coords: tuple[tuple[float, float], tuple[float, float]]) -> Union[str, None]:
+    def rejection_rate(self) -> float:
+        """
+        :return: The fraction of sampled steps that were rejected because they hit a wall
+        """
+        if self.attempted_steps == 0:
+            return 0.0
+        return self.rejected_steps / self.attempted_steps
+
+    def obstacle_intersection(self, obstacle: str, line_coords: tuple[tuple[float, float], tuple[float, float]]) -> Union[int, None]:
         """
         :param obstacle: The type of obstacle to check for intersection. Can be either 'wall' or 'portal'.
         :param line_coords: The coordinates of the line to check for intersection, in the format ((x1, y1), (x2, y2)).
-        :return: The obstacle that intersects with the line, or None if no intersection is found.
+        :return: The index in the world of the obstacle that intersects with the line, or None if no intersection is found.
         """
-        list = self.app.walls if obstacle == 'wall' else self.app.portals
-        for obstacle in list:
-            obstacle_coords = self.app.canvas.coords(obstacle)
-            obstacle_coords = ((obstacle_coords[0], obstacle_coords[1]), (obstacle_coords[2], obstacle_coords[3]))
-            if self.intersects(obstacle_coords, line_coords):
-                return obstacle
-        return None
+        start = time.perf_counter() if Instrument.enabled else 0.0
+        segments = self.world.walls if obstacle == 'wall' else self.world.portals
+        found = None
+        for index in self.world.candidates(obstacle, line_coords):
+            if self.intersects(segments[index], line_coords):
+                found = index
+                break
+        if start:
+            Instrument.add_time('walker.{}_check'.format(obstacle), start)
+        return found
 
     def intersects(self, line1: tuple[tuple[float, float], tuple[float, float]], line2: tuple[tuple[float, float], tuple[float, float]]) -> bool:
         """
@@ -197,6 +400,56 @@ class Walker:
 
         return False
 
+    def intersection_parameter(self, line1: tuple[tuple[float, float], tuple[float, float]], line2: tuple[tuple[float, float], tuple[float, float]]) -> Optional[float]:
+        """
+        :param line1: A tuple representing the coordinates of the first line segment in the format (x1, y1), (x2, y2)
+        :param line2: A tuple representing the coordinates of the second line segment in the format (x1, y1), (x2, y2)
+        :return: The fraction (between 0 and 1) of the way along line2 at which it first touches line1,
+            or None if the two line segments do not intersect
+
+        The point of intersection is found in closed form by solving p + t * r = a + u * s, where p and r are the start
+        and direction of line2 and a and s are the start and direction of line1. When the segments are collinear and
+        overlap, the fraction of the first point of line2 that lies on line1 is returned.
+        Values within a small tolerance of the ends of the segments are accepted, so that every pair of segments
+        `intersects` reports as intersecting gets a fraction despite floating point rounding.
+        """
+        (ax, ay), (bx, by) = line1
+        (px, py), (qx, qy) = line2
+        rx, ry = qx - px, qy - py
+        sx, sy = bx - ax, by - ay
+        tolerance = 1e-9
+        denominator = rx * sy - ry * sx
+        if denominator != 0:
+            t = ((ax - px) * sy - (ay - py) * sx) / denominator
+            u = ((ax - px) * ry - (ay - py) * rx) / denominator
+            if -tolerance <= t <= 1 + tolerance and -tolerance <= u <= 1 + tolerance:
+                return min(max(t, 0.0), 1.0)
+            return None
+
+        # the segments are parallel, they can only meet if they are collinear
+        if (ax - px) * ry - (ay - py) * rx != 0:
+            return None
+        length = rx * rx + ry * ry
+        if length == 0:
+            return 0.0 if self.intersects(line1, line2) else None
+        t0 = ((ax - px) * rx + (ay - py) * ry) / length
+        t1 = ((bx - px) * rx + (by - py) * ry) / length
+        if max(t0, t1) < -tolerance or min(t0, t1) > 1 + tolerance:
+            return None
+        return min(max(min(t0, t1), 0.0), 1.0)
+
+    def intersection_point(self, line1: tuple[tuple[float, float], tuple[float, float]], line2: tuple[tuple[float, float], tuple[float, float]]) -> Optional[Tuple[float, float]]:
+        """
+        :param line1: A tuple representing the coordinates of the first line segment in the format (x1, y1), (x2, y2)
+        :param line2: A tuple representing the coordinates of the second line segment in the format (x1, y1), (x2, y2)
+        :return: The first point along line2 at which it touches line1, or None if the two line segments do not intersect
+        """
+        t = self.intersection_parameter(line1, line2)
+        if t is None:
+            return None
+        (px, py), (qx, qy) = line2
+        return px + t * (qx - px), py + t * (qy - py)
+
     def calculate_end_coordinates(self, x: float, y: float, angle_degrees: float, distance: float) -> Tuple[float, float]:
         """
         Calculates the end coordinates based on the initial coordinates, angle, and distance.
@@ -230,18 +483,118 @@ class Walker:
         angle_degrees = math.degrees(angle_radians)
         return angle_degrees + 180
 
-    def copy(self, copies: int) -> None:
+    def copy(self, copies: int, workers: int = 1, progress: Optional[Callable[[int], None]] = None,
+             cache: Optional[Cache.EnsembleCache] = None, on_block: Optional[Callable[[int], None]] = None) -> None:
         """
-        Create additional copies of the walker.
+        Create additional copies of the walker and fold their statistics into the averages. The copies are not
+        kept, only the running averages are. Asking for fewer copies than before, or for copies after the walker
+        took more steps, starts the averages over.
+
+        Every copy has its own seed derived from the walker's seed and its index, so the averages are the same
+        whatever the number of workers simulating them (see Ensemble.run_ensemble). The statistics of the copies
+        are cached by everything they depend on, so asking for the same copies again does not simulate them.
 
         :param copies: The number of copies to create.
         :type copies: int
+        :param workers: The number of worker processes to simulate the copies in
+        :param progress: Called with the number of new copies merged so far (optional)
+        :param cache: The cache of ensemble statistics to use (defaults to Cache.default_cache)
+        :param on_block: Called with the number of copies of every block once it is merged (optional). The blocks
+            are then merged straight into the averages and `copies` counts them as they come, so the walker can be
+            checkpointed between blocks (see Checkpoint); the cache is not used.
         :return: None
         """
-        for i in range(copies - self.copies):
-            sub_walker = Walker(self.name, self.type, self.color, False, self.app, self.chances)
-            self.subwalkers.append(sub_walker)
-            for j in range(self.stats.iterations):
-                sub_walker.step()
-            self.averages.update(sub_walker, self.copies)
-            self.copies += 1
+        first = self._prepare_copies(copies)
+        if on_block is not None:
+            merged = [0]
+
+            def block_done(done: int) -> None:
+                self.copies = first + done
+                if progress is not None:
+                    progress(done)
+                on_block(done - merged[0])
+                merged[0] = done
+
+            Ensemble.run_ensemble(self.averages, self.type, self.stats.iterations, first, copies, self.seed,
+                                  self.chances, self.world, workers, block_done)
+            self.copies = max(copies, self.copies)
+            return
+        cache = cache if cache is not None else Cache.default_cache
+        key = self.ensemble_key(first, copies)
+        result = cache.get(key)
+        if result is None:
+            result = Ensemble.ensemble_stats(self.type, self.stats.iterations, first, copies, self.seed,
+                                             self.chances, self.world, workers, progress)
+            cache.put(key, result)
+        self.averages.merge(*result)
+        self.copies = max(copies, self.copies)
+
+    def copy_async(self, copies: int, worker, workers: int = 1, on_done: Optional[Callable[[], None]] = None,
+                   on_progress: Optional[Callable[[int], None]] = None,
+                   cache: Optional[Cache.EnsembleCache] = None) -> Optional[int]:
+        """
+        Like copy, but the copies are simulated by a SimulationWorker while the Tk main loop keeps running. The
+        averages are updated on the main loop once the copies are done, unless the walker took steps meanwhile.
+
+        :param copies: The number of copies to create.
+        :param worker: The SimulationWorker to simulate the copies in
+        :param workers: The number of worker processes to simulate the copies in
+        :param on_done: Called on the main loop once the averages are updated (optional)
+        :param on_progress: Called on the main loop with the number of new copies merged so far (optional)
+        :param cache: The cache of ensemble statistics to use (defaults to Cache.default_cache)
+        :return: The id of the job, to cancel it with worker.cancel, or None if the copies were cached and the
+            averages are already updated
+        """
+        first = self._prepare_copies(copies)
+        cache = cache if cache is not None else Cache.default_cache
+        iterations = self.stats.iterations
+        key = self.ensemble_key(first, copies)
+        cached = cache.get(key)
+        if cached is not None:
+            self.averages.merge(*cached)
+            self.copies = max(copies, self.copies)
+            if on_done is not None:
+                on_done()
+            return None
+
+        def merge(result) -> None:
+            cache.put(key, result)
+            # the copies are only valid for the steps and copies the walker had when they were started
+            if self.stats.iterations == iterations and self.copies == first:
+                self.averages.merge(*result)
+                self.copies = max(copies, self.copies)
+            if on_done is not None:
+                on_done()
+
+        # the worker gets its own copy of the world, so walls added in the meantime do not change the copies
+        return worker.submit(Ensemble.ensemble_stats, self.type, iterations, first, copies, self.seed, self.chances,
+                             copy.deepcopy(self.world), workers, on_result=merge, on_progress=on_progress)
+
+    def _prepare_copies(self, copies: int) -> int:
+        """
+        Start the averages over if the copies asked for can not be added to the ones already averaged.
+
+        :return: The index of the first copy still to simulate
+        """
+        if copies < self.copies or self.averages.steps != self.stats.iterations + 1:
+            self.reset_copies()
+        return self.copies
+
+    def ensemble_key(self, first: int, last: int) -> Tuple:
+        """
+        :return: The cache key of the copies numbered first to last - 1 of the walker at its current step
+        """
+        return Cache.ensemble_key(self.type, self.stats.iterations, first, last, self.seed, self.chances, self.world)
+
+    def reset_copies(self) -> None:
+        """
+        Forget all copies of the walker, leaving the averages of the walker alone.
+        """
+        self.averages.clear()
+        self.copies = 1
+
+    def has_obstacles(self) -> bool:
+        """
+        :return: True if there are walls or portals the walker could run into
+        """
+        return self.world.has_obstacles()
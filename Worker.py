@@ -0,0 +1,146 @@
+import queue
+import threading
+from typing import *
+
+# the time in milliseconds between two looks at the results of the worker
+POLL_INTERVAL = 50
+
+
+class SimulationWorker:
+    """
+    Runs long simulations, such as ensembles of walker copies, on a background thread so the Tk main loop keeps
+    handling input. Jobs are sent to the thread through a command queue and run one at a time; their progress and
+    results come back through a result queue, which the main loop polls with `after`, so every callback runs on
+    the main loop.
+
+    A job is a function called as function(*args, progress=..., cancelled=...): it reports progress by calling
+    progress(value) and should stop early once cancelled() returns True.
+
+    Attributes:
+    - app: the Gui whose main loop polls the results
+    - poll_interval: the time in milliseconds between two polls
+    - commands: the queue of (job id, function, args) waiting for the thread, None to stop it
+    - results: the queue of (kind, job id, value) messages waiting for the main loop, kind being 'progress',
+        'done', 'error' or 'cancelled'
+    - callbacks: a dictionary mapping the id of every job still running to its (on_result, on_progress, on_error)
+    - cancelled: the ids of the jobs that were cancelled
+    """
+    def __init__(self, app, poll_interval: int = POLL_INTERVAL) -> None:
+        self.app = app
+        self.poll_interval = poll_interval
+        self.commands: queue.Queue = queue.Queue()
+        self.results: queue.Queue = queue.Queue()
+        self.callbacks: Dict[int, Tuple[Optional[Callable], Optional[Callable], Optional[Callable]]] = {}
+        self.cancelled: Set[int] = set()
+        self._next_job = 0
+        self._thread: Optional[threading.Thread] = None
+        self._polling = False
+
+    def submit(self, function: Callable, *args: Any, on_result: Optional[Callable[[Any], None]] = None,
+               on_progress: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None) -> int:
+        """
+        Queue a job for the worker thread.
+
+        :param function: The function to run on the worker thread
+        :param args: The arguments of the function
+        :param on_result: Called on the main loop with the return value of the function (optional)
+        :param on_progress: Called on the main loop with every progress value the function reports (optional)
+        :param on_error: Called on the main loop with the exception if the function fails, otherwise the
+            exception is raised on the main loop (optional)
+        :return: The id of the job
+        """
+        self._next_job += 1
+        job = self._next_job
+        self.callbacks[job] = (on_result, on_progress, on_error)
+        self.commands.put((job, function, args))
+        if self._thread is None or not self._thread.is_alive():
+            # a daemon, so a job still running does not keep the app from closing
+            self._thread = threading.Thread(target=self._run, name='SimulationWorker', daemon=True)
+            self._thread.start()
+        if not self._polling:
+            self._polling = True
+            self.app.after(self.poll_interval, self.poll)
+        return job
+
+    def cancel(self, job: Optional[int]) -> None:
+        """
+        Cancel a job: it stops at its next check, and none of its callbacks are called anymore.
+
+        :param job: The id of the job, None does nothing
+        """
+        if job in self.callbacks:
+            del self.callbacks[job]
+            self.cancelled.add(job)
+
+    def busy(self) -> bool:
+        """
+        :return: True while there are jobs that are not done
+        """
+        return bool(self.callbacks)
+
+    def stop(self) -> None:
+        """
+        Cancel every job and let the worker thread end.
+        """
+        for job in list(self.callbacks):
+            self.cancel(job)
+        self.commands.put(None)
+
+    def poll(self) -> None:
+        """
+        Hand every message of the worker thread to its callback, and keep polling while jobs are running.
+        """
+        try:
+            while True:
+                try:
+                    kind, job, value = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if job not in self.callbacks:
+                    # a cancelled job, forgotten once it has stopped
+                    if kind != 'progress':
+                        self.cancelled.discard(job)
+                    continue
+                on_result, on_progress, on_error = self.callbacks[job]
+                if kind == 'progress':
+                    if on_progress is not None:
+                        on_progress(value)
+                    continue
+                del self.callbacks[job]
+                if kind == 'done':
+                    if on_result is not None:
+                        on_result(value)
+                elif on_error is not None:
+                    on_error(value)
+                else:
+                    raise value
+        finally:
+            # also after a failing callback, so the other jobs are still polled, and until the cancelled jobs stop
+            if self.callbacks or self.cancelled:
+                self.app.after(self.poll_interval, self.poll)
+            else:
+                self._polling = False
+
+    def _run(self) -> None:
+        while True:
+            command = self.commands.get()
+            if command is None:
+                return
+            job, function, args = command
+            if job in self.cancelled:
+                self.results.put(('cancelled', job, None))
+                continue
+
+            def progress(value: Any, job: int = job) -> None:
+                self.results.put(('progress', job, value))
+
+            def cancelled(job: int = job) -> bool:
+                return job in self.cancelled
+
+            try:
+                result = function(*args, progress=progress, cancelled=cancelled)
+            except Exception as error:
+                self.results.put(('error', job, error))
+            else:
+                self.results.put(('cancelled' if job in self.cancelled else 'done', job, result))
@@ -0,0 +1,195 @@
+import hashlib
+import math
+from typing import *
+
+Point = Tuple[float, float]
+Segment = Tuple[Point, Point]
+
+
+class SegmentGrid:
+    """
+    A uniform grid over line segments, used as a broad phase for intersection queries: every cell holds the
+    indices of the segments passing through it, so a query only looks at the segments near its bounding box.
+
+    Attributes:
+    - cell_size: the width and height of each grid cell
+    - cells: a dictionary mapping (column, row) cells to the sorted indices of the segments crossing them
+    """
+    def __init__(self, cell_size: float = 50.0) -> None:
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+    def insert(self, index: int, segment: Segment) -> None:
+        """
+        Add a segment to every cell it passes through. Indices must be inserted in increasing order.
+
+        :param index: The index of the segment
+        :param segment: The segment in the format ((x1, y1), (x2, y2))
+        """
+        (x1, y1), (x2, y2) = segment
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        first_column = self._cell(x1)
+        last_column = self._cell(x2)
+        for column in range(first_column, last_column + 1):
+            # the part of the segment inside this column of cells
+            left = max(x1, column * self.cell_size)
+            right = min(x2, (column + 1) * self.cell_size)
+            if x1 == x2:
+                low, high = y1, y2
+            else:
+                slope = (y2 - y1) / (x2 - x1)
+                low = y1 + (left - x1) * slope
+                high = y1 + (right - x1) * slope
+            if low > high:
+                low, high = high, low
+            for row in range(self._cell(low), self._cell(high) + 1):
+                self.cells.setdefault((column, row), []).append(index)
+
+    def query(self, segment: Segment) -> List[int]:
+        """
+        :param segment: The segment in the format ((x1, y1), (x2, y2))
+        :return: The sorted indices of the segments sharing a cell with the bounding box of the given segment
+        """
+        (x1, y1), (x2, y2) = segment
+        columns = range(self._cell(min(x1, x2)), self._cell(max(x1, x2)) + 1)
+        rows = range(self._cell(min(y1, y2)), self._cell(max(y1, y2)) + 1)
+        if len(columns) == 1 and len(rows) == 1:
+            return self.cells.get((columns.start, rows.start), [])
+        candidates: Set[int] = set()
+        for column in columns:
+            for row in rows:
+                candidates.update(self.cells.get((column, row), ()))
+        return sorted(candidates)
+
+    def clear(self) -> None:
+        """
+        Remove all segments from the grid.
+        """
+        self.cells.clear()
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_size)
+
+
+class World:
+    """
+    A headless model of the obstacles a walker can run into, kept in plain Python lists so the walkers never
+    have to query the Tk canvas.
+
+    Attributes:
+    - walls: a list of wall segments in the format ((x1, y1), (x2, y2))
+    - wall_keys: the key of each wall (the canvas item id when the wall was drawn by the GUI)
+    - portals: a list of portal segments in the format ((x1, y1), (x2, y2))
+    - portal_exits: the (x, y) center of the exit circle of each portal
+    - portal_keys: the key of each portal (the canvas item id when the portal was drawn by the GUI)
+    - wall_grid, portal_grid: spatial indexes over the walls and portals, updated as obstacles are added
+    """
+    def __init__(self) -> None:
+        self.walls: List[Segment] = []
+        self.wall_keys: List[Any] = []
+        self.portals: List[Segment] = []
+        self.portal_exits: List[Point] = []
+        self.portal_keys: List[Any] = []
+        self.wall_grid = SegmentGrid()
+        self.portal_grid = SegmentGrid()
+
+    def add_wall(self, segment: Sequence[float], key: Any = None) -> int:
+        """
+        Add a wall to the world.
+
+        :param segment: The coordinates of the wall, either as (x1, y1, x2, y2) or ((x1, y1), (x2, y2))
+        :param key: An optional key identifying the wall (defaults to its index)
+        :return: The index of the new wall
+        """
+        index = len(self.walls)
+        self.walls.append(self.to_segment(segment))
+        self.wall_keys.append(index if key is None else key)
+        self.wall_grid.insert(index, self.walls[index])
+        return index
+
+    def add_portal(self, segment: Sequence[float], exit: Point, key: Any = None) -> int:
+        """
+        Add a portal to the world.
+
+        :param segment: The coordinates of the portal line, either as (x1, y1, x2, y2) or ((x1, y1), (x2, y2))
+        :param exit: The (x, y) center of the circle walkers come out of
+        :param key: An optional key identifying the portal (defaults to its index)
+        :return: The index of the new portal
+        """
+        index = len(self.portals)
+        self.portals.append(self.to_segment(segment))
+        self.portal_exits.append((float(exit[0]), float(exit[1])))
+        self.portal_keys.append(index if key is None else key)
+        self.portal_grid.insert(index, self.portals[index])
+        return index
+
+    def candidates(self, obstacle: str, segment: Segment) -> List[int]:
+        """
+        :param obstacle: The type of obstacle to look for. Can be either 'wall' or 'portal'.
+        :param segment: The segment to look around, in the format ((x1, y1), (x2, y2))
+        :return: The sorted indices of the walls or portals that may intersect the segment
+        """
+        grid = self.wall_grid if obstacle == 'wall' else self.portal_grid
+        return grid.query(segment)
+
+    def has_obstacles(self) -> bool:
+        """
+        :return: True if the world has any walls or portals
+        """
+        return bool(self.walls or self.portals)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: The walls and portals as plain lists, ready for JSON (the keys are left out)
+        """
+        return {
+            'walls': [[x1, y1, x2, y2] for (x1, y1), (x2, y2) in self.walls],
+            'portals': [{'segment': [x1, y1, x2, y2], 'exit': list(exit)}
+                        for ((x1, y1), (x2, y2)), exit in zip(self.portals, self.portal_exits)],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'World':
+        """
+        :param data: Walls and portals as returned by to_dict
+        :return: A new world with those walls and portals
+        """
+        world = cls()
+        for wall in data.get('walls', []):
+            world.add_wall(wall)
+        for portal in data.get('portals', []):
+            world.add_portal(portal['segment'], portal['exit'])
+        return world
+
+    def fingerprint(self) -> str:
+        """
+        :return: A hash of the walls, portals and exits, the same for any two worlds walkers step through the same
+            way (the keys are left out)
+        """
+        scene = repr((self.walls, self.portals, self.portal_exits))
+        return hashlib.sha256(scene.encode()).hexdigest()
+
+    def clear(self) -> None:
+        """
+        Remove all walls and portals from the world.
+        """
+        self.walls.clear()
+        self.wall_keys.clear()
+        self.portals.clear()
+        self.portal_exits.clear()
+        self.portal_keys.clear()
+        self.wall_grid.clear()
+        self.portal_grid.clear()
+
+    @staticmethod
+    def to_segment(coords: Sequence[Any]) -> Segment:
+        """
+        :param coords: Segment coordinates as (x1, y1, x2, y2) or ((x1, y1), (x2, y2))
+        :return: The segment in the format ((x1, y1), (x2, y2)) with float coordinates
+        """
+        if len(coords) == 2:
+            (x1, y1), (x2, y2) = coords
+        else:
+            x1, y1, x2, y2 = coords
+        return (float(x1), float(y1)), (float(x2), float(y2))
@@ -0,0 +1,223 @@
+"""
+Benchmarks of the simulation hot paths. Every case uses fixed seeds and runs without a display.
+
+    python benchmark.py                                   run every case and print the results
+    python benchmark.py --out results.json                also save them as JSON
+    python benchmark.py --baseline baseline.json          compare with saved results, exit 1 on a regression
+    python benchmark.py --quick --filter step_type_1      fewer repeats, only the matching cases
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import numpy as np
+from typing import *
+import Seeds
+import Stream
+from Cache import EnsembleCache
+from Stats import WalkerStats, AverageStats
+from Walker import Walker
+from World import World
+
+# the number of obstacles of each kind (walls, and as many portals) the stepping cases run with
+OBSTACLE_COUNTS = (0, 10, 100, 1000)
+# the ensemble sizes the copy cases run with
+ENSEMBLE_SIZES = (10, 100, 1000)
+# a case is a regression when it is this much slower than its baseline
+TOLERANCE = 0.2
+
+
+def make_world(count: int, seed: int = 0) -> World:
+    """
+    :param count: The number of walls, and of portals
+    :return: A world with short walls and portals scattered around (0,0), the same every time for the same seed
+    """
+    rng = random.Random(seed)
+    world = World()
+    for i in range(count):
+        for add in (world.add_wall, lambda segment: world.add_portal(segment, (rng.uniform(-1000, 1000),
+                                                                               rng.uniform(-1000, 1000)))):
+            x, y = rng.uniform(-1000, 1000), rng.uniform(-1000, 1000)
+            angle = rng.uniform(0, 2 * np.pi)
+            add((x, y, x + 40 * np.cos(angle), y + 40 * np.sin(angle)))
+    return world
+
+
+def make_walker(type: int, world: Optional[World] = None, storage: str = 'list') -> Walker:
+    return Walker('Benchmark', type, None, False, chances=[0.2, 0.2, 0.2, 0.2, 0.2], world=world or World(),
+                  storage=storage, seed=Seeds.seed_sequence('benchmark', type))
+
+
+def case_step(type: int, obstacles: int) -> Tuple[Callable[[], None], int]:
+    steps = 2000
+    world = make_world(obstacles)
+
+    def run() -> None:
+        walker = make_walker(type, world)
+        for i in range(steps):
+            walker.step()
+    return run, steps
+
+
+def case_stream(type: int, metrics: Sequence[str]) -> Tuple[Callable[[], None], int]:
+    steps = 20000
+
+    def run() -> None:
+        Stream.run(make_walker(type), steps, [Stream.MetricsRecorder(metrics)])
+    return run, steps
+
+
+def case_stats_update(storage: str) -> Tuple[Callable[[], None], int]:
+    updates = 50000
+    rng = np.random.default_rng(1)
+    positions = [tuple(position) for position in rng.integers(-500, 500, (updates, 2)).tolist()]
+
+    def run() -> None:
+        stats = WalkerStats(storage)
+        for position in positions:
+            stats.update(position)
+    return run, updates
+
+
+def case_average_update() -> Tuple[Callable[[], None], int]:
+    copies = 200
+    walkers = []
+    for index in range(copies):
+        walker = Walker('', 1, None, False, is_sub=True, storage='compact', seed=Seeds.seed_sequence('average', index))
+        for i in range(500):
+            walker.step()
+        walkers.append(walker)
+
+    def run() -> None:
+        averages = AverageStats()
+        for walker in walkers:
+            averages.update(walker)
+    return run, copies
+
+
+def case_copy(type: int, copies: int, obstacles: int = 0) -> Tuple[Callable[[], None], int]:
+    steps = 200
+    world = make_world(obstacles)
+    walker = make_walker(type, world, 'compact')
+    for i in range(steps):
+        walker.step()
+
+    def run() -> None:
+        walker.reset_copies()
+        # a fresh cache, so the copies are simulated every time
+        walker.copy(copies, workers=1, cache=EnsembleCache())
+    return run, (copies - 1) * steps
+
+
+def case_intersects() -> Tuple[Callable[[], None], int]:
+    rng = random.Random(2)
+    pairs = [(((rng.uniform(-50, 50), rng.uniform(-50, 50)), (rng.uniform(-50, 50), rng.uniform(-50, 50))),
+              ((rng.uniform(-50, 50), rng.uniform(-50, 50)), (rng.uniform(-50, 50), rng.uniform(-50, 50))))
+             for i in range(20000)]
+    walker = make_walker(1)
+
+    def run() -> None:
+        for line1, line2 in pairs:
+            walker.intersects(line1, line2)
+    return run, len(pairs)
+
+
+def cases() -> Dict[str, Callable[[], Tuple[Callable[[], None], int]]]:
+    """
+    :return: A dictionary mapping the name of every case to a function that prepares it, returning the function
+        to time and the number of operations it performs
+    """
+    all_cases = {}
+    for type in (1, 2, 3, 4):
+        for obstacles in OBSTACLE_COUNTS:
+            all_cases['step_type_{}_obstacles_{}'.format(type, obstacles)] = \
+                lambda type=type, obstacles=obstacles: case_step(type, obstacles)
+    all_cases['stream_type_1_radius_steps'] = lambda: case_stream(1, ['radius_steps'])
+    for storage in ('list', 'compact', 'disk'):
+        all_cases['stats_update_{}'.format(storage)] = lambda storage=storage: case_stats_update(storage)
+    all_cases['average_update'] = case_average_update
+    for copies in ENSEMBLE_SIZES:
+        all_cases['copy_type_1_copies_{}'.format(copies)] = lambda copies=copies: case_copy(1, copies)
+    all_cases['copy_type_1_copies_10_obstacles_10'] = lambda: case_copy(1, 10, 10)
+    all_cases['intersects'] = case_intersects
+    return all_cases
+
+
+def run_cases(pattern: str = '', repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    :param pattern: Only the cases whose name contains it are run
+    :param repeat: The number of times every case is timed, the fastest time is kept
+    :return: A dictionary mapping the name of every case run to its time in seconds, operations and operations
+        per second
+    """
+    results = {}
+    for name, prepare in cases().items():
+        if pattern not in name:
+            continue
+        run, operations = prepare()
+        best = float('inf')
+        for i in range(repeat):
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+        results[name] = {'seconds': best, 'operations': operations, 'per_second': operations / max(best, 1e-12)}
+        print('{:<40} {:>12,.0f} /s  ({:.4f} s)'.format(name, results[name]['per_second'], best))
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float = TOLERANCE) -> List[str]:
+    """
+    Print how every case compares with its baseline.
+
+    :param results: The results of run_cases
+    :param baseline: Results saved earlier
+    :param tolerance: How much slower than its baseline a case may be before it counts as a regression
+    :return: The names of the cases that regressed
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['per_second'] / baseline[name]['per_second']
+        flag = ''
+        if ratio < 1 - tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print('{:<40} {:>6.2f}x{}'.format(name, ratio, flag))
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the simulation hot paths.')
+    parser.add_argument('--out', help='save the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with the results in this JSON file')
+    parser.add_argument('--filter', default='', help='only run the cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=3, help='the number of times every case is timed')
+    parser.add_argument('--quick', action='store_true', help='time every case once')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='how much slower than the baseline counts as a regression')
+    options = parser.parse_args(argv)
+
+    results = run_cases(options.filter, 1 if options.quick else options.repeat)
+    report = {
+        'meta': {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+    if options.out:
+        with open(options.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)['results']
+        print()
+        if compare(results, baseline, options.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import pytest
+from typing import *
+import Seeds
+from Walker import Walker
+from World import World
+
+# the chances of the type 4 walkers of the tests
+CHANCES = [0.1, 0.2, 0.3, 0.3, 0.1]
+
+
+def scene() -> World:
+    """
+    :return: The world the tests walk through: a short wall just above (0,0), and a portal across the whole view
+        below and above it, both leading back to (0,0), so short walks hit the wall and go through the portals
+    """
+    world = World()
+    world.add_wall((-30, 20, 30, 20))
+    world.add_portal((-1000, -25, 1000, -25), (0, 0))
+    world.add_portal((-1000, 45, 1000, 45), (0, 0))
+    return world
+
+
+@pytest.fixture
+def make_world() -> Callable[..., World]:
+    """
+    :return: A function making a new world, with the walls and portals of scene, or empty with obstacles=False
+    """
+    def make(obstacles: bool = True) -> World:
+        return scene() if obstacles else World()
+    return make
+
+
+@pytest.fixture
+def make_walker() -> Callable[..., Walker]:
+    """
+    :return: A function making a walker seeded by its name and type, so the same arguments always walk the same way.
+        It takes the type, storage and obstacles (True for scene, False for none, or a World), and optionally the
+        name, color and app of the walker.
+    """
+    def make(type: int = 1, storage: str = 'compact', obstacles: Union[bool, World] = True, name: str = 'Walker',
+             color: Optional[str] = None, app=None) -> Walker:
+        if isinstance(obstacles, World):
+            world = obstacles
+        else:
+            world = scene() if obstacles else World()
+        return Walker(name, type, color, app is not None, app=app, chances=CHANCES, world=world, storage=storage,
+                      seed=Seeds.seed_sequence(name, type))
+    return make
@@ -1,5 +1,4 @@
 import sys
-import Gui
 from typing import *
 
 def main() -> None:
@@ -8,19 +7,25 @@ def main() -> None:
 
     :return: None
     """
-    try:
-        if sys.argv[1] == "--help":
-            print("To run Random Walker, type 'python main.py' \n")
-            print("Useful shortcuts:")
-            print(" Space: make all walkers take a step")
-            print(" Shift + drag: enable screen to be moved")
-            print(" Mouse scroll: zoom in/out")
-    except IndexError:
+    if len(sys.argv) < 2:
+        import Gui
         app = Gui.Gui()
         app.after(100, app.get_canvas_center)
         # app.after(100, app.create_axis)
         app.make_walker_man('Example Walker', 1, 'blue', True)
         app.mainloop()
+    elif sys.argv[1] == "--help":
+        print("To run Random Walker, type 'python main.py' \n")
+        print("Useful shortcuts:")
+        print(" Space: make all walkers take a step")
+        print(" Shift + drag: enable screen to be moved")
+        print(" Mouse scroll: zoom in/out \n")
+        print("To run a walker without the GUI, type 'python main.py run [options]'")
+        print("(see 'python main.py run --help')")
+    elif sys.argv[1] == "run":
+        # imported here so running without the GUI never loads tkinter or matplotlib
+        import Batch
+        Batch.run(sys.argv[2:])
 
 
 if __name__ == "__main__":
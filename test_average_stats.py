@@ -0,0 +1,64 @@
+import pytest
+import numpy as np
+import Ensemble
+from Stats import WalkerStats, AverageStats, METRICS
+from Walker import Walker
+
+
+class Holder:
+    def __init__(self, stats):
+        self.stats = stats
+
+
+# Test that the running averages match the mean and variance of all the walkers' statistics
+def test_streaming_matches_numpy():
+    rng = np.random.default_rng(8)
+    positions = Ensemble.simulate_positions(2, generators(rng, 40), 100)
+    metrics = Ensemble.positions_to_stats(positions)
+
+    one_by_one = AverageStats(Holder(WalkerStats()))
+    one_by_one.count = 0
+    for walker in range(40):
+        stats = WalkerStats()
+        for x, y in positions[walker, 1:]:
+            stats.update((int(x), int(y)))
+        one_by_one.update(Holder(stats))
+
+    in_blocks = AverageStats(Holder(WalkerStats()))
+    in_blocks.count = 0
+    in_blocks.update_batch({name: values[:15] for name, values in metrics.items()})
+    in_blocks.update_batch({name: values[15:] for name, values in metrics.items()})
+
+    for averages in (one_by_one, in_blocks):
+        assert averages.count == 40
+        for name in METRICS:
+            assert np.allclose(averages.mean(name), metrics[name].mean(axis=0))
+            assert np.allclose(averages.variance(name), metrics[name].var(axis=0, ddof=1))
+            low, high = averages.confidence_interval(name)
+            assert np.all(low <= averages.mean(name)) and np.all(averages.mean(name) <= high)
+
+
+# Test that the averages start from the walker itself and are rebuilt when fewer copies are asked for
+def test_walker_copies():
+    walker = Walker("Averaged", 1, "blue", False)
+    for i in range(50):
+        walker.step()
+    walker.copy(1)
+    assert walker.averages.count == 1
+    assert np.array_equal(walker.averages.mean('radius_steps'), walker.stats.radius_steps)
+    assert np.all(walker.averages.variance('radius_steps') == 0)
+
+    walker.copy(300)
+    assert walker.averages.count == walker.copies == 300
+    assert walker.averages.steps == 51
+    walker.copy(20)
+    assert walker.averages.count == walker.copies == 20
+
+    # stepping the walker again makes the averages stale
+    walker.step()
+    walker.copy(20)
+    assert walker.averages.steps == 52
+
+
+def generators(rng, count):
+    return [np.random.default_rng(seed) for seed in rng.integers(0, 2 ** 32, count)]
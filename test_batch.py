@@ -0,0 +1,68 @@
+import pytest
+import io
+import json
+import subprocess
+import sys
+import numpy as np
+import Batch
+import Checkpoint
+import Export
+import Seeds
+from Walker import Walker
+from World import World
+
+
+# Test that a batch run walks the same way as a walker made with the same seed and name, and saves its results
+def test_run_saves_results(tmp_path):
+    scene = tmp_path / 'scene.json'
+    world = World()
+    world.add_wall((-50, 30, 50, 30))
+    scene.write_text(json.dumps(world.to_dict()))
+    out = tmp_path / 'results.npz'
+    report = io.StringIO()
+    summary = Batch.run(['--type', '4', '--chances', '10', '20', '30', '20', '20', '--steps', '2e2', '--copies', '5',
+                         '--seed', 'S', '--scene', str(scene), '--out', str(out), '--workers', '1'], report)
+    assert summary['steps'] == 200 and summary['seed'] == 'S'
+    assert 'steps/s' in report.getvalue()
+
+    run = Export.load(str(out))
+    assert run.metadata['chances'] == [0.1, 0.2, 0.3, 0.2, 0.2]
+    assert run.averages.count == 5 and run.world().walls == world.walls
+    walker = Walker('Walker', 4, None, False, chances=[0.1, 0.2, 0.3, 0.2, 0.2], world=world,
+                    seed=Seeds.seed_sequence('S', 'Walker'))
+    for i in range(200):
+        walker.step()
+    assert np.array_equal(np.asarray(run.stats.steps_locations), np.asarray(walker.stats.steps_locations))
+
+
+def test_run_checks_chances():
+    with pytest.raises(SystemExit):
+        Batch.run(['--type', '4'], io.StringIO())
+    with pytest.raises(SystemExit):
+        Batch.run(['--type', '4', '--chances', '10', '10', '10', '10', '10'], io.StringIO())
+
+
+# Test that the command line never loads the GUI libraries
+def test_main_run_is_headless():
+    code = ("import sys, main; sys.argv = ['main.py', 'run', '--steps', '50', '--copies', '3', '--workers', '1']; "
+            "main.main(); assert 'tkinter' not in sys.modules and 'matplotlib' not in sys.modules")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert 'Walked 50 steps' in result.stdout
+
+
+# Test that errors of a headless run are reported rather than opening the GUI
+def test_main_reports_errors(tmp_path):
+    scene = tmp_path / 'scene.json'
+    scene.write_text(json.dumps({'portals': [{'segment': [-50, 1, 50, 1], 'exit': [3]}]}))
+    result = subprocess.run([sys.executable, '-c', 'import main; main.main()', 'run', '--scene', str(scene)],
+                            capture_output=True, text=True)
+    assert result.returncode == 2
+    assert 'is not a valid World.to_dict file' in result.stderr and 'Traceback' not in result.stderr
+
+
+def test_resume_needs_a_walker(tmp_path):
+    checkpoint = str(tmp_path / 'empty.ckpt')
+    Checkpoint.save(checkpoint, [], World())
+    with pytest.raises(SystemExit):
+        Batch.run(['--resume', checkpoint], io.StringIO())
@@ -0,0 +1,18 @@
+import pytest
+import json
+import benchmark
+
+
+def test_compare_flags_regressions():
+    baseline = {'fast': {'per_second': 100.0}, 'slow': {'per_second': 100.0}, 'gone': {'per_second': 1.0}}
+    results = {'fast': {'per_second': 95.0}, 'slow': {'per_second': 50.0}, 'new': {'per_second': 1.0}}
+    assert benchmark.compare(results, baseline) == ['slow']
+
+
+# Test that a run writes its results as JSON, and passes against itself as the baseline
+def test_main_writes_json(tmp_path):
+    out = tmp_path / 'results.json'
+    assert benchmark.main(['--quick', '--filter', 'intersects', '--out', str(out)]) == 0
+    report = json.loads(out.read_text())
+    assert set(report['results']) == {'intersects'} and report['results']['intersects']['operations'] == 20000
+    assert benchmark.main(['--quick', '--filter', 'intersects', '--baseline', str(out), '--tolerance', '0.9']) == 0
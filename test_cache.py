@@ -0,0 +1,80 @@
+import pytest
+import numpy as np
+import Cache
+import Ensemble
+import Seeds
+from Cache import EnsembleCache
+from Walker import Walker
+from World import World
+
+
+def entry(steps, value=1.0):
+    means = {name: np.full(steps, value) for name in Ensemble.METRICS}
+    m2s = {name: np.zeros(steps) for name in Ensemble.METRICS}
+    return 5, means, m2s
+
+
+# Test that the least recently used entries are forgotten once the cache is over its size
+def test_lru_eviction_by_size():
+    size = EnsembleCache.size(entry(100))
+    cache = EnsembleCache(max_bytes=2 * size)
+    cache.put('a', entry(100))
+    cache.put('b', entry(100))
+    assert cache.get('a') is not None  # 'b' is now the least recently used
+    cache.put('c', entry(100))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.nbytes == 2 * size
+    # too big to keep at all
+    cache.put('d', entry(1000))
+    assert cache.get('d') is None and cache.nbytes == 2 * size
+
+
+def test_disk_tier(tmp_path):
+    cache = EnsembleCache(directory=str(tmp_path))
+    key = ('seed', 1, 2)
+    cache.put(key, entry(50, 3.0))
+    # a new cache, like after restarting the app, finds the entry on disk
+    reopened = EnsembleCache(directory=str(tmp_path))
+    count, means, m2s = reopened.get(key)
+    assert count == 5 and np.array_equal(means['radius_steps'], np.full(50, 3.0))
+    assert reopened.get(('seed', 1, 3)) is None
+    assert reopened.hits == 1 and reopened.misses == 1
+
+
+# Test that the key changes with everything the copies depend on
+def test_ensemble_key():
+    seed = Seeds.seed_sequence(1, 'Walker')
+    world = World()
+    key = Cache.ensemble_key(2, 100, 1, 50, seed, None, world)
+    assert key == Cache.ensemble_key(2, 100, 1, 50, Seeds.seed_sequence('1', 'Walker'), None, World())
+    assert key != Cache.ensemble_key(2, 100, 1, 50, Seeds.seed_sequence(1, 'Other'), None, world)
+    assert key != Cache.ensemble_key(2, 101, 1, 50, seed, None, world)
+    assert key != Cache.ensemble_key(2, 100, 1, 51, seed, None, world)
+    assert key != Cache.ensemble_key(1, 100, 1, 50, seed, None, world)
+    walled = World()
+    walled.add_wall((0, 10, 10, 10), key=77)
+    other = World()
+    other.add_wall((0, 10, 10, 10), key=12)
+    assert key != Cache.ensemble_key(2, 100, 1, 50, seed, None, walled)
+    assert Cache.ensemble_key(2, 100, 1, 50, seed, None, walled) == Cache.ensemble_key(2, 100, 1, 50, seed, None, other)
+    chances = [0.2, 0.2, 0.2, 0.2, 0.2]
+    assert Cache.ensemble_key(4, 100, 1, 50, seed, chances, world) != \
+        Cache.ensemble_key(4, 100, 1, 50, seed, [0.4, 0, 0.2, 0.2, 0.2], world)
+
+
+# Test that copying again after the averages were reset uses the cache and gives the same averages
+def test_copy_uses_cache():
+    cache = EnsembleCache()
+    walker = Walker("Cached", 1, "blue", False, seed=Seeds.seed_sequence('cache', 'Cached'))
+    for i in range(30):
+        walker.step()
+    walker.copy(300, cache=cache)
+    expected = {name: walker.averages.mean(name).copy() for name in Ensemble.METRICS}
+    assert cache.misses == 1
+
+    walker.reset_copies()
+    walker.copy(300, cache=cache)
+    assert cache.hits == 1 and walker.copies == 300
+    for name in Ensemble.METRICS:
+        assert np.array_equal(walker.averages.mean(name), expected[name])
@@ -0,0 +1,153 @@
+import pytest
+import io
+import numpy as np
+import Batch
+import Checkpoint
+import Ensemble
+import Export
+from Walker import Walker
+
+
+def assert_same_walk(walker1: Walker, walker2: Walker) -> None:
+    columns1, columns2 = walker1.stats.columns(), walker2.stats.columns()
+    for name in columns1:
+        assert np.array_equal(columns1[name], columns2[name]), name
+    assert (walker1.lastx, walker1.lasty) == (walker2.lastx, walker2.lasty)
+    assert walker1.rejected_steps == walker2.rejected_steps
+
+
+# Test that a walker loaded from a checkpoint keeps walking exactly as the saved walker, with its averages
+@pytest.mark.parametrize('type,storage', [(1, 'list'), (2, 'compact'), (3, 'list'), (4, 'disk')])
+def test_resume_is_identical(tmp_path, make_walker, type, storage):
+    walker = make_walker(type, storage, color='red')
+    world = walker.world
+    # stop in the middle of a block of random numbers
+    for i in range(777):
+        walker.step()
+    walker.copy(4)
+    path = str(tmp_path / 'run.ckpt')
+    Checkpoint.save(path, [walker], world, {'seed': 'checkpoint'})
+
+    snapshot = Checkpoint.load(path)
+    resumed = snapshot.walkers[0]
+    assert snapshot.metadata == {'seed': 'checkpoint'}
+    assert resumed.world is snapshot.world and snapshot.world.walls == world.walls
+    assert resumed.stats.storage == storage and resumed.color == 'red'
+    assert resumed.copies == 4 and resumed.averages.count == 4
+    assert_same_walk(walker, resumed)
+
+    for i in range(500):
+        walker.step()
+        resumed.step()
+    assert_same_walk(walker, resumed)
+    walker.copy(6)
+    resumed.copy(6)
+    assert np.array_equal(walker.averages.mean('radius_steps'), resumed.averages.mean('radius_steps'))
+
+
+# Test that checkpoints are saved every so many steps or seconds
+def test_checkpointer_intervals(tmp_path, monkeypatch, make_walker):
+    walker = make_walker(obstacles=False)
+    path = str(tmp_path / 'run.ckpt')
+    checkpointer = Checkpoint.Checkpointer(path, [walker], walker.world, every_steps=10)
+    saved = [checkpointer.step() for i in range(25)]
+    assert saved.count(True) == 2 and saved[9] and saved[19]
+    assert checkpointer.saves == 2
+
+    clock = [0.0]
+    monkeypatch.setattr(Checkpoint.time, 'monotonic', lambda: clock[0])
+    checkpointer = Checkpoint.Checkpointer(path, [walker], walker.world, every_seconds=5)
+    assert not checkpointer.step()
+    clock[0] = 6.0
+    assert checkpointer.step()
+    assert not checkpointer.step()
+
+
+# Test that an interrupted batch run resumed from its checkpoint gives the results of an uninterrupted one
+def test_batch_resume(tmp_path):
+    walker = ['--type', '2', '--seed', 'R']
+    options = ['--copies', '3', '--workers', '1']
+    Batch.run(walker + options + ['--steps', '300', '--out', str(tmp_path / 'whole.npz')], io.StringIO())
+
+    checkpoint = str(tmp_path / 'run.ckpt')
+    Batch.run(walker + options + ['--steps', '120', '--checkpoint', checkpoint, '--checkpoint-steps', '50'],
+              io.StringIO())
+    report = io.StringIO()
+    summary = Batch.run(options + ['--steps', '300', '--resume', checkpoint, '--out', str(tmp_path / 'resumed.npz')],
+                        report)
+    assert summary['seed'] == 'R'
+    assert 'Resumed at step 120' in report.getvalue()
+
+    whole = Export.load(str(tmp_path / 'whole.npz'))
+    resumed = Export.load(str(tmp_path / 'resumed.npz'))
+    assert np.array_equal(whole.stats.steps_locations, resumed.stats.steps_locations)
+    assert resumed.averages.count == 3
+    assert np.array_equal(whole.averages.mean('distance_from_center'), resumed.averages.mean('distance_from_center'))
+
+
+def test_batch_checks_checkpoint_options(tmp_path):
+    checkpoint = str(tmp_path / 'run.ckpt')
+    Batch.run(['--steps', '10', '--checkpoint', checkpoint, '--checkpoint-steps', '5'], io.StringIO())
+    for given in (['--seed', 'X'], ['--type', '1'], ['--name', 'Other'], ['--scene', 'scene.json'],
+                  ['--chances', '20', '20', '20', '20', '20']):
+        with pytest.raises(SystemExit):
+            Batch.run(given + ['--resume', checkpoint], io.StringIO())
+    with pytest.raises(SystemExit):
+        Batch.run(['--checkpoint-steps', '10'], io.StringIO())
+    with pytest.raises(SystemExit):
+        Batch.run(['--checkpoint', 'run.ckpt'], io.StringIO())
+    for interval in (['--checkpoint-steps', '0.5'], ['--checkpoint-steps', '0'], ['--checkpoint-seconds', '0']):
+        with pytest.raises(SystemExit):
+            Batch.run(['--checkpoint', 'run.ckpt'] + interval, io.StringIO())
+
+
+# Test that a resumed batch run keeps the storage it was saved with, unless asked for another one
+def test_batch_resume_keeps_storage(tmp_path):
+    checkpoint = str(tmp_path / 'run.ckpt')
+    Batch.run(['--steps', '50', '--storage', 'disk', '--checkpoint', checkpoint, '--checkpoint-steps', '20'],
+              io.StringIO())
+    assert Checkpoint.load(checkpoint).walkers[0].stats.storage == 'disk'
+    Batch.run(['--steps', '80', '--resume', checkpoint, '--checkpoint', checkpoint, '--checkpoint-steps', '20'],
+              io.StringIO())
+    assert Checkpoint.load(checkpoint).walkers[0].stats.storage == 'disk'
+    Batch.run(['--steps', '90', '--storage', 'list', '--resume', checkpoint, '--checkpoint', checkpoint,
+               '--checkpoint-steps', '20'], io.StringIO())
+    assert Checkpoint.load(checkpoint).walkers[0].stats.storage == 'list'
+
+
+class Crash(Exception):
+    pass
+
+
+# Test that an ensemble interrupted between blocks resumes from its last checkpointed block, with the same averages
+def test_batch_resume_copies(tmp_path, monkeypatch):
+    monkeypatch.setattr(Ensemble, 'ENSEMBLE_BLOCK', 4)
+    options = ['--steps', '50', '--copies', '20', '--workers', '1', '--checkpoint-steps', '100']
+    whole = str(tmp_path / 'whole.npz')
+    Batch.run(options + ['--seed', 'E', '--checkpoint', str(tmp_path / 'whole.ckpt'), '--out', whole],
+              io.StringIO())
+
+    checkpoint = str(tmp_path / 'run.ckpt')
+    save = Checkpoint.Checkpointer.save
+
+    def save_then_crash(self):
+        save(self)
+        if self.walkers[0].copies == 9:
+            raise Crash()
+
+    monkeypatch.setattr(Checkpoint.Checkpointer, 'save', save_then_crash)
+    with pytest.raises(Crash):
+        Batch.run(options + ['--seed', 'E', '--checkpoint', checkpoint], io.StringIO())
+    monkeypatch.setattr(Checkpoint.Checkpointer, 'save', save)
+    assert Checkpoint.load(checkpoint).walkers[0].copies == 9
+
+    report = io.StringIO()
+    resumed = str(tmp_path / 'resumed.npz')
+    Batch.run(options + ['--resume', checkpoint, '--checkpoint', checkpoint, '--out', resumed], report)
+    assert 'with 9 copies' in report.getvalue()
+    assert 'Simulated 11 copies' in report.getvalue()
+    whole, resumed = Export.load(whole), Export.load(resumed)
+    assert resumed.averages.count == 20
+    for name in ('distance_from_center', 'radius_steps'):
+        assert np.array_equal(whole.averages.mean(name), resumed.averages.mean(name))
+        assert np.array_equal(whole.averages.variance(name), resumed.averages.variance(name))
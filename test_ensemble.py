@@ -0,0 +1,141 @@
+import pytest
+import bisect
+import math
+import numpy as np
+import Ensemble
+import Seeds
+from Stats import WalkerStats, AverageStats
+from Walker import Walker
+from World import World
+
+
+# Test that the bulk statistics match the ones WalkerStats records step by step
+@pytest.mark.parametrize("type", [1, 2, 3])
+def test_positions_to_stats_matches_walker_stats(type):
+    rng = np.random.default_rng(1234)
+    positions = Ensemble.simulate_positions(type, generators(rng, 5), 300)
+    metrics = Ensemble.positions_to_stats(positions)
+
+    for walker in range(5):
+        stats = WalkerStats()
+        for x, y in positions[walker, 1:]:
+            stats.update((int(x), int(y)))
+        for name in Ensemble.METRICS:
+            expected = getattr(stats, name)
+            assert np.allclose(metrics[name][walker], expected), "Mismatch in {} for walker {}".format(name, walker)
+
+
+# Test that every bulk step has the length and direction its type allows
+def test_simulate_positions_step_shapes():
+    rng = np.random.default_rng(99)
+    positions = Ensemble.simulate_positions(3, generators(rng, 4), 50)
+    assert positions.shape == (4, 51, 2)
+    assert np.all(positions[:, 0] == 0)
+    steps = np.diff(positions, axis=1)
+    lengths = np.hypot(steps[:, :, 0], steps[:, :, 1])
+    assert np.allclose(lengths, 10)
+    # type 3 only walks along the axes
+    assert np.all(np.isclose(steps[:, :, 0], 0, atol=1e-9) | np.isclose(steps[:, :, 1], 0, atol=1e-9))
+
+    positions = Ensemble.simulate_positions(2, generators(rng, 4), 50)
+    steps = np.diff(positions, axis=1)
+    lengths = np.hypot(steps[:, :, 0], steps[:, :, 1])
+    assert np.all((lengths >= 5 - 1e-9) & (lengths <= 15 + 1e-9))
+
+
+def test_count_crossings():
+    values = np.array([[0, 3, 0, 0, -2, -1, 0, 4, 5]])
+    crossings = Ensemble.count_crossings(values)
+    assert crossings.tolist() == [[0, 0, 0, 0, 1, 1, 1, 2, 2]]
+    assert math.isclose(crossings[0, -1], 2)
+
+
+# Test that the compiled table picks the same directions as the original if/elif ladder
+def test_type_4_table_matches_ladder():
+    chances = [0.1, 0.2, 0.3, 0.15, 0.25]
+    walker = Walker("Biased", 4, "blue", False, chances=chances)
+    cum_percentages = [sum(chances[:i + 1]) for i in range(len(chances))]
+    for i in range(1000):
+        rand_num = i / 1000
+        if rand_num < cum_percentages[0]:
+            expected = 0
+        elif rand_num < cum_percentages[1]:
+            expected = 1
+        elif rand_num < cum_percentages[2]:
+            expected = 2
+        elif rand_num < cum_percentages[3]:
+            expected = 3
+        else:
+            expected = 4
+        assert bisect.bisect_right(walker.cum_chances, rand_num) == expected
+    assert Ensemble.sample_type_4_choices(walker.cum_chances, 1000, FakeRng()).tolist() == \
+        [bisect.bisect_right(walker.cum_chances, i / 1000) for i in range(1000)]
+
+
+class FakeRng:
+    def random(self, size):
+        return np.arange(size) / size
+
+
+# Test that a bulk type 4 block follows its chances
+def test_simulate_type_4_positions():
+    rng = np.random.default_rng(5)
+    positions = Ensemble.simulate_positions(4, generators(rng, 200), 100, [0.5, 0, 0, 0.5, 0])
+    steps = np.diff(positions, axis=1)
+    # only up (-y) and right (+x)
+    assert np.all(np.isclose(steps[:, :, 1], -10) | np.isclose(steps[:, :, 0], 10))
+    assert math.isclose(np.isclose(steps[:, :, 1], -10).mean(), 0.5, abs_tol=0.02)
+
+    # walkers always going towards (0,0) stay close to it
+    positions = Ensemble.simulate_positions(4, generators(rng, 10), 50, [0, 0, 0, 0, 1])
+    assert np.all(np.hypot(positions[:, :, 0], positions[:, :, 1]) <= 10 + 1e-9)
+
+
+def generators(rng, count):
+    return [np.random.default_rng(seed) for seed in rng.integers(0, 2 ** 32, count)]
+
+
+# Test that the averages are the same bit for bit whatever the number of workers
+@pytest.mark.parametrize("walls", [False, True])
+def test_run_ensemble_is_reproducible_across_workers(walls):
+    world = World()
+    if walls:
+        world.add_wall((-40, 25, 40, 25))
+        world.add_portal((-40, -25, 40, -25), (0, 100))
+    seed = Seeds.seed_sequence('session', 'Walker')
+    copies = Ensemble.ENSEMBLE_BLOCK * 2 + 10 if not walls else Ensemble.ENSEMBLE_BLOCK + 20
+    results = []
+    for workers in (1, 3):
+        averages = AverageStats()
+        done = []
+        Ensemble.run_ensemble(averages, 2, 30, 1, copies, seed, world=world, workers=workers, progress=done.append)
+        assert averages.count == copies - 1 and done[-1] == copies - 1
+        results.append(averages)
+    for name in Ensemble.METRICS:
+        assert np.array_equal(results[0].mean(name), results[1].mean(name))
+        assert np.array_equal(results[0].variance(name), results[1].variance(name))
+
+
+# Test that a copy's path depends only on the walker's seed and the copy's index
+def test_copy_seeds_are_independent_of_blocks():
+    seed = Seeds.seed_sequence(1234, 'Walker')
+    whole = Ensemble.simulate_positions(1, [np.random.default_rng(Seeds.child_sequence(seed, i)) for i in range(1, 6)], 20)
+    part = Ensemble.simulate_positions(1, [np.random.default_rng(Seeds.child_sequence(seed, i)) for i in range(3, 6)], 20)
+    assert np.array_equal(whole[2:], part)
+    assert not np.array_equal(Seeds.seed_sequence(1234, 'Other').generate_state(4), seed.generate_state(4))
+    assert np.array_equal(Seeds.seed_sequence('1234', 'Walker').generate_state(4), seed.generate_state(4))
+
+
+# Test that a copy simulated in bulk walks the same path as the same copy stepped on its own
+@pytest.mark.parametrize("type", [1, 2, 3, 4])
+def test_bulk_copies_match_stepped_walkers(type):
+    chances = [0.2, 0.1, 0.3, 0.2, 0.2]
+    seed = Seeds.seed_sequence('session', 'Walker')
+    sequences = [Seeds.child_sequence(seed, index) for index in range(1, 4)]
+    positions = Ensemble.simulate_positions(type, [np.random.default_rng(sequence) for sequence in sequences], 100,
+                                            chances)
+    for copy, sequence in enumerate(sequences):
+        walker = Walker("Walker", type, "blue", False, chances=chances, is_sub=True, seed=sequence)
+        for i in range(100):
+            walker.step()
+            assert np.allclose(positions[copy, i + 1], (walker.lastx, walker.lasty), atol=1e-9)
@@ -0,0 +1,56 @@
+import pytest
+import numpy as np
+import Export
+import Seeds
+from Stats import COLUMNS, METRICS, WalkerStats
+from Walker import Walker
+
+
+@pytest.fixture
+def exported(make_walker):
+    walker = make_walker(4, name='Exported', color='blue')
+    for i in range(400):
+        walker.step()
+    walker.copy(20)
+    return walker
+
+
+# Test that both formats give back the same statistics, averages and metadata
+@pytest.mark.parametrize("format", ['npz', 'columns'])
+def test_round_trip(tmp_path, exported, format):
+    walker = exported
+    path = str(tmp_path / 'run.npz') if format == 'npz' else str(tmp_path / 'run')
+    if format == 'npz':
+        Export.save_npz(path, walker)
+    else:
+        Export.save_columns(path, walker, chunk_rows=150)
+    run = Export.load(path)
+
+    for name in COLUMNS:
+        assert np.array_equal(np.asarray(getattr(run.stats, name)), np.asarray(getattr(walker.stats, name)))
+    for name in METRICS:
+        assert np.array_equal(run.averages.mean(name), walker.averages.mean(name))
+        assert np.array_equal(run.averages.variance(name), walker.averages.variance(name))
+    assert run.averages.count == 20
+    assert run.metadata['type'] == 4 and run.metadata['iterations'] == 400
+    assert run.world().fingerprint() == walker.world.fingerprint()
+
+    # the loaded seed walks the same way
+    again = Walker("Exported", 4, "blue", False, chances=run.metadata['chances'], world=run.world(),
+                   seed=run.seed())
+    for i in range(400):
+        again.step()
+    assert np.array_equal(np.asarray(again.stats.steps_locations), np.asarray(walker.stats.steps_locations))
+
+
+# Test that loaded statistics keep counting from where they stopped
+def test_loaded_stats_continue():
+    walker = Walker("Crosser", 3, "blue", False, seed=Seeds.seed_sequence('continue'))
+    for i in range(300):
+        walker.step()
+    stats = WalkerStats.from_columns(walker.stats.columns(), 'list')
+    for i in range(300):
+        walker.step()
+        stats.update(walker.stats.steps_locations[-1])
+    for name in COLUMNS:
+        assert np.array_equal(np.asarray(getattr(stats, name)), np.asarray(getattr(walker.stats, name)))
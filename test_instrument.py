@@ -0,0 +1,43 @@
+import json
+import time
+import Instrument
+
+
+def setup_function() -> None:
+    Instrument.reset()
+
+
+def teardown_function() -> None:
+    Instrument.enable(False)
+    Instrument.reset()
+
+
+def test_nothing_recorded_when_disabled(make_walker):
+    walker = make_walker()
+    for i in range(200):
+        walker.step()
+    assert Instrument.counters == {}
+    assert Instrument.timers == {}
+
+
+def test_counters_and_timers_when_enabled(make_walker):
+    Instrument.enable()
+    walker = make_walker()
+    for i in range(2000):
+        walker.step()
+    assert Instrument.timers['walker.step'][0] == 2000
+    assert Instrument.timers['stats.update'][0] == 2000
+    assert Instrument.counters.get('walker.wall_rejections', 0) == walker.rejected_steps
+
+
+def test_snapshot_summary_and_dump(tmp_path):
+    Instrument.count('events', 3)
+    Instrument.add_time('section', time.perf_counter())
+    Instrument.add_time('section', time.perf_counter())
+    path = str(tmp_path / 'profile.json')
+    Instrument.dump(path)
+    with open(path) as f:
+        data = json.load(f)
+    assert data['counters'] == {'events': 3}
+    assert data['timers']['section']['calls'] == 2
+    assert Instrument.summary().startswith('section ')
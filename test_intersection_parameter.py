@@ -0,0 +1,50 @@
+import pytest
+import math
+import random
+from Walker import Walker
+
+
+def test_intersection_parameter():
+    walker = Walker(name="Wally", type=1, color="blue", graphic=False)
+
+    # Test case: crossing halfway along the step
+    portal = ((-5, 5), (5, 5))
+    step = ((0, 0), (0, 10))
+    assert math.isclose(walker.intersection_parameter(portal, step), 0.5)
+    assert walker.intersection_point(portal, step) == pytest.approx((0, 5))
+
+    # Test case: touching at the end of the step
+    step = ((0, 0), (0, 5))
+    assert math.isclose(walker.intersection_parameter(portal, step), 1)
+
+    # Test case: no intersection
+    step = ((0, 0), (0, 4.99))
+    assert walker.intersection_parameter(portal, step) is None
+    assert walker.intersection_point(portal, step) is None
+
+    # Test case: parallel lines
+    step = ((-5, 0), (5, 0))
+    assert walker.intersection_parameter(portal, step) is None
+
+    # Test case: collinear and overlapping, the first shared point is used
+    step = ((-10, 5), (10, 5))
+    assert math.isclose(walker.intersection_parameter(portal, step), 0.25)
+    step = ((0, 5), (10, 5))
+    assert math.isclose(walker.intersection_parameter(portal, step), 0)
+
+
+# Test that the closed form agrees with the orientation test of Walker.intersects
+def test_intersection_parameter_agrees_with_intersects():
+    walker = Walker(name="Wally", type=1, color="blue", graphic=False)
+    rng = random.Random(3)
+    for i in range(5000):
+        line1 = ((rng.uniform(-20, 20), rng.uniform(-20, 20)), (rng.uniform(-20, 20), rng.uniform(-20, 20)))
+        line2 = ((rng.uniform(-20, 20), rng.uniform(-20, 20)), (rng.uniform(-20, 20), rng.uniform(-20, 20)))
+        t = walker.intersection_parameter(line1, line2)
+        assert (t is not None) == walker.intersects(line1, line2)
+        if t is not None:
+            point = walker.intersection_point(line1, line2)
+            # the point lies on line1
+            (ax, ay), (bx, by) = line1
+            cross = (bx - ax) * (point[1] - ay) - (by - ay) * (point[0] - ax)
+            assert math.isclose(cross, 0, abs_tol=1e-6)
@@ -0,0 +1,152 @@
+import pytest
+import math
+import Render
+import Seeds
+from Walker import Walker
+from World import World
+
+
+class FakeCanvas:
+    """
+    Records the items a renderer creates instead of drawing them
+    """
+    def __init__(self):
+        self.items = {}
+
+    def create_line(self, coords, **options):
+        self.items[len(self.items) + 1] = list(coords)
+        return len(self.items)
+
+    def coords(self, item, coords):
+        self.items[item] = list(coords)
+
+    def delete(self, item):
+        del self.items[item]
+
+
+class FakeApp:
+    def __init__(self):
+        self.canvas = FakeCanvas()
+        self.world = World()
+        self.seed = 'render'
+        self.zoomed = 1.0
+        self.idle = []
+        self.region = None
+        self.renderer = Render.TrajectoryRenderer(self)
+
+    def visible_region(self):
+        return self.region
+
+    def after_idle(self, callback):
+        self.idle.append(callback)
+
+    def run_idle(self):
+        while self.idle:
+            self.idle.pop(0)()
+
+
+# Test that many steps of a walker end up in a handful of polylines, flushed once per frame
+def test_one_polyline_per_walker():
+    app = FakeApp()
+    walkers = [Walker(name, 1, "blue", True, app) for name in ("A", "B")]
+    for i in range(300):
+        for walker in walkers:
+            walker.step()
+    assert len(app.idle) == 1
+    app.run_idle()
+    assert len(app.canvas.items) == 2
+    # the polyline holds every point of the walk
+    assert len(app.canvas.items[1]) == 2 * 301
+
+    for i in range(2 * Render.MAX_POINTS):
+        walkers[0].step()
+    app.run_idle()
+    assert len(app.canvas.items) == 4
+    assert app.renderer.items_created == 4
+    # only the polyline being extended was redrawn
+    assert app.canvas.items[4][-2:] == [walkers[0].lastx, walkers[0].lasty]
+
+
+# Test that a teleport starts a new polyline at the portal's exit
+def test_teleport_breaks_polyline():
+    app = FakeApp()
+    app.world.add_portal(((-1000, 5), (1000, 5)), (0, 500))
+    walker = Walker("Jumper", 3, "blue", True, app, seed=Seeds.seed_sequence('jump'))
+    while walker.lasty < 400:
+        walker.step()
+    app.run_idle()
+    last = app.canvas.items[len(app.canvas.items)]
+    assert len(app.canvas.items) >= 2
+    assert last[:2] == [0.0, 500.0]
+
+
+def test_level_for_zoom():
+    assert Render.level_for_zoom(1.0) == 0
+    assert Render.level_for_zoom(100.0) == 0
+    levels = [Render.level_for_zoom(0.5 ** i) for i in range(12)]
+    assert levels == sorted(levels) and levels[-1] == Render.LOD_LEVELS
+    # the points of the chosen level are never further than LOD_PIXELS apart on screen
+    for zoom in (0.3, 0.1, 0.02, 0.005):
+        assert Render.cell_size(Render.level_for_zoom(zoom)) * zoom <= Render.LOD_PIXELS
+
+
+# Test that zooming out draws a decimated trajectory, and zooming back in draws every point again
+def test_zoomed_out_trajectory_is_decimated():
+    app = FakeApp()
+    walker = Walker("A", 1, "blue", True, app)
+    for i in range(5000):
+        walker.step()
+    app.run_idle()
+    full = sum(len(coords) for coords in app.canvas.items.values()) // 2
+    assert full >= 5001
+
+    app.zoomed = 0.05
+    app.renderer.refresh()
+    app.run_idle()
+    decimated = [coords for coords in app.canvas.items.values()]
+    points = sum(len(coords) for coords in decimated) // 2
+    assert points < full / 10
+    # it still ends where the walker is
+    assert decimated[-1][-2:] == [walker.lastx * 0.05, walker.lasty * 0.05]
+
+    # consecutive points of a level are at least the level's distance apart
+    level = Render.level_for_zoom(0.05)
+    kept = app.renderer.paths[walker][0].levels[level]
+    assert all(math.dist(a, b) >= Render.cell_size(level) for a, b in zip(kept, kept[1:]))
+
+    app.zoomed = 1.0
+    app.renderer.refresh()
+    app.run_idle()
+    assert sum(len(coords) for coords in app.canvas.items.values()) // 2 == full
+
+
+# Test that only the polylines in the visible region are drawn, and the others appear when panned to
+def test_only_visible_polylines_are_drawn():
+    app = FakeApp()
+    app.world.add_portal(((-1000, 5), (1000, 5)), (0, 5000))
+    walker = Walker("Jumper", 3, "blue", True, app, seed=Seeds.seed_sequence('jump'))
+    while walker.lasty < 4000:
+        walker.step()
+    for i in range(3 * Render.MAX_POINTS):
+        walker.step()
+    app.run_idle()
+    everything = len(app.canvas.items)
+
+    # only around the origin, before the teleport
+    app.region = (-100, -100, 100, 100)
+    app.renderer.refresh()
+    app.run_idle()
+    near_origin = len(app.canvas.items)
+    assert 0 < near_origin < everything
+    for coords in app.canvas.items.values():
+        assert min(coords[1::2]) < 100
+
+    # panning to the exit draws the polylines there instead
+    app.region = (-100, 4900, 100, 5100)
+    app.renderer.refresh()
+    app.run_idle()
+    assert all(max(coords[1::2]) > 4900 for coords in app.canvas.items.values())
+    # a view change is drawn once however many times it is requested
+    app.renderer.refresh()
+    app.renderer.refresh()
+    assert len(app.idle) == 1
@@ -0,0 +1,72 @@
+import pytest
+import Render
+import Scheduler
+from Walker import Walker
+from test_render import FakeApp
+
+
+class TimerApp(FakeApp):
+    """
+    A FakeApp that also queues the callbacks of after, to run them one tick at a time
+    """
+    def __init__(self):
+        super().__init__()
+        self.timers = []
+
+    def after(self, delay, callback, *args):
+        self.timers.append((callback, args))
+
+    def run_timers(self):
+        ticks = 0
+        while self.timers:
+            callback, args = self.timers.pop(0)
+            callback(*args)
+            ticks += 1
+        return ticks
+
+
+# Test that every walker takes exactly its steps, spread over ticks, and on_done is called once
+def test_scheduler_runs_every_step():
+    app = TimerApp()
+    walkers = [Walker(name, 1, "blue", True, app) for name in ("A", "B", "C")]
+    done = []
+    scheduler = Scheduler.StepScheduler(app)
+    scheduler.start(walkers, 500, on_done=lambda: done.append(True))
+    assert scheduler.running()
+    app.run_timers()
+    assert not scheduler.running()
+    assert done == [True]
+    for walker in walkers:
+        assert walker.stats.iterations == 500
+    # the frames were drawn as the walkers went
+    assert len(app.canvas.items) == 3
+
+
+# Test that the fast mode does not flush between ticks, only once at the end
+def test_fast_mode_draws_final_frame_only():
+    app = TimerApp()
+    walker = Walker("A", 2, "blue", True, app)
+    scheduler = Scheduler.StepScheduler(app, budget=0)
+    scheduler.start([walker], 200, fast=True)
+    assert not app.renderer.auto_flush
+    app.run_timers()
+    assert app.idle == []
+    assert app.renderer.auto_flush
+    assert len(app.canvas.items[1]) == 2 * 201
+
+
+# Test that cancelling drops the remaining steps but still finishes the run, calling on_done once
+def test_cancel_drops_remaining_steps():
+    app = TimerApp()
+    walker = Walker("A", 3, "blue", False, app)
+    done = []
+    scheduler = Scheduler.StepScheduler(app)
+    scheduler.start([walker], 10 ** 6, fast=True, on_done=lambda: done.append(True))
+    scheduler.cancel()
+    assert done == [True]
+    assert app.renderer.auto_flush
+    app.run_timers()
+    assert walker.stats.iterations == 0
+    assert done == [True]
+    scheduler.cancel()
+    assert done == [True]
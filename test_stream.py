@@ -0,0 +1,152 @@
+import pytest
+import io
+import subprocess
+import sys
+import numpy as np
+import Batch
+import Checkpoint
+import Stream
+from Stats import WalkerStats
+
+
+class SegmentRenderer:
+    def __init__(self) -> None:
+        self.segments = []
+
+    def add_segment(self, walker, start, end) -> None:
+        self.segments.append((start, end))
+
+
+class SegmentApp:
+    def __init__(self, world) -> None:
+        self.canvas = None
+        self.world = world
+        self.seed = 'stream'
+        self.renderer = SegmentRenderer()
+
+
+# Test that streaming the steps into the walker's statistics gives the same walk as stepping it
+@pytest.mark.parametrize('type', [1, 2, 3, 4])
+def test_iter_steps_matches_step(make_walker, type):
+    stepped = make_walker(type)
+    for i in range(1500):
+        stepped.step()
+    streamed = make_walker(type)
+    Stream.run(streamed, 1500, [Stream.StatsRecorder(streamed.stats)], chunk=100)
+    for name, values in stepped.stats.columns().items():
+        assert np.array_equal(values, streamed.stats.columns()[name]), name
+    assert (stepped.lastx, stepped.lasty) == (streamed.lastx, streamed.lasty)
+
+
+def test_iter_steps_chunks(make_walker):
+    walker = make_walker()
+    chunks = list(walker.iter_steps(250, chunk=100))
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert [chunk.first for chunk in chunks] == [1, 101, 201]
+    assert chunks[0].segments is None
+    assert tuple(chunks[-1].positions[-1]) == (walker.lastx, walker.lasty)
+    # nothing is recorded without a consumer
+    assert walker.stats.iterations == 0
+    assert list(walker.iter_steps(0)) == []
+
+
+# Test that only the metrics asked for are recorded, with the values of WalkerStats across chunk boundaries
+def test_metrics_recorder(make_walker):
+    walker = make_walker(3)
+    stats = WalkerStats('compact')
+    metrics = Stream.MetricsRecorder(['radius_steps', 'times_crossed_x', 'times_crossed_y'])
+    Stream.run(walker, 2000, [Stream.StatsRecorder(stats), metrics], chunk=7)
+    columns = metrics.columns()
+    assert set(columns) == {'radius_steps', 'times_crossed_x', 'times_crossed_y'}
+    for name, values in columns.items():
+        assert np.array_equal(values, stats.columns()[name]), name
+
+    everything = Stream.MetricsRecorder()
+    stats = WalkerStats('compact')
+    Stream.run(make_walker(1), 500, [Stream.StatsRecorder(stats), everything], chunk=64)
+    for name, values in everything.columns().items():
+        assert np.array_equal(values, stats.columns()[name]), name
+    with pytest.raises(ValueError):
+        Stream.MetricsRecorder(['steps'])
+
+
+# Test that the render consumer draws the segments step would have drawn, portals included
+def test_render_consumer(make_walker, make_world):
+    app = SegmentApp(make_world())
+    stepped = make_walker(1, obstacles=app.world, app=app)
+    for i in range(1000):
+        stepped.step()
+    drawn = app.renderer.segments
+
+    streamed = make_walker(1, obstacles=app.world, app=app)
+    app.renderer = SegmentRenderer()
+    Stream.run(streamed, 1000, [Stream.RenderConsumer(streamed, app.renderer)], chunk=128)
+    assert len(app.renderer.segments) > 1000
+    assert np.allclose(np.array(app.renderer.segments), np.array(drawn))
+
+
+def test_position_writer(tmp_path, make_walker):
+    path = str(tmp_path / 'positions.bin')
+    walker = make_walker()
+    writer = Stream.PositionWriter(path)
+    chunks = []
+
+    class Keep(Stream.Consumer):
+        def consume(self, chunk):
+            chunks.append(chunk.positions)
+
+    Stream.run(walker, 300, [writer, Keep()], chunk=64)
+    assert writer.rows == 300
+    positions = Stream.load_positions(path)
+    assert np.array_equal(positions, np.concatenate(chunks))
+    assert np.array_equal(Stream.load_positions(path, mmap=False), positions)
+
+    summary = Batch.run(['--steps', '200', '--seed', 'P', '--positions', path], io.StringIO())
+    assert summary['steps'] == 200 and len(Stream.load_positions(path)) == 200
+
+
+# Test that a resumed batch run continues the positions written before its checkpoint
+def test_positions_resume(tmp_path):
+    options = ['--seed', 'P', '--workers', '1']
+    whole = str(tmp_path / 'whole.bin')
+    Batch.run(options + ['--steps', '300', '--positions', whole], io.StringIO())
+
+    path = str(tmp_path / 'positions.bin')
+    checkpoint = str(tmp_path / 'run.ckpt')
+    Batch.run(options + ['--steps', '120', '--positions', path, '--checkpoint', checkpoint,
+                         '--checkpoint-steps', '100'], io.StringIO())
+    # positions written after the checkpoint, before the run was interrupted, are dropped when resuming
+    with open(path, 'ab') as f:
+        f.write(np.zeros((5, 2)).tobytes())
+    Batch.run(['--workers', '1', '--steps', '300', '--positions', path, '--resume', checkpoint], io.StringIO())
+    assert np.array_equal(Stream.load_positions(path), Stream.load_positions(whole))
+
+    with pytest.raises(SystemExit):
+        Batch.run(['--steps', '400', '--positions', str(tmp_path / 'new.bin'), '--resume', checkpoint], io.StringIO())
+
+
+# Test that the positions written before a checkpoint are on disk when the process dies right after it
+def test_positions_survive_crash(tmp_path):
+    path = str(tmp_path / 'positions.bin')
+    checkpoint = str(tmp_path / 'run.ckpt')
+    crash = '''
+import os, sys
+import Batch, Checkpoint
+save = Checkpoint.Checkpointer.save
+def save_then_die(self):
+    save(self)
+    if self.saves == 2:
+        os._exit(3)
+Checkpoint.Checkpointer.save = save_then_die
+Batch.run(sys.argv[1:])
+'''
+    result = subprocess.run([sys.executable, '-c', crash, '--seed', 'C', '--steps', '1000', '--positions', path,
+                             '--checkpoint', checkpoint, '--checkpoint-steps', '100'], capture_output=True, text=True)
+    assert result.returncode == 3, result.stderr
+    assert len(Stream.load_positions(path)) >= 200
+    assert Checkpoint.load(checkpoint).walkers[0].stats.iterations == 200
+
+    Batch.run(['--steps', '1000', '--positions', path, '--resume', checkpoint], io.StringIO())
+    whole = str(tmp_path / 'whole.bin')
+    Batch.run(['--seed', 'C', '--steps', '1000', '--positions', whole], io.StringIO())
+    assert np.array_equal(Stream.load_positions(path), Stream.load_positions(whole))
@@ -0,0 +1,119 @@
+import pytest
+import os
+import random
+import numpy as np
+import Stats
+from Stats import COLUMNS, WalkerStats, GrowableArray
+
+
+class ReferenceStats(WalkerStats):
+    """
+    The original implementation of WalkerStats.update, which walks back through the locations to count crossings
+    """
+    def update(self, position):
+        self.iterations += 1
+        self.steps_locations.append(position)
+
+        self.distance_from_center.append(self.calculate_distance(position, (0, 0)))
+
+        self.distance_from_x.append(abs(position[0]))
+        self.distance_from_y.append(abs(position[1]))
+
+        i = 0
+        while self.distance_from_center[-1] > i:
+            i += 1
+        self.radius_steps.append(self.radius_steps[-1] + i)
+
+        for axis, crossed in ((1, self.times_crossed_x), (0, self.times_crossed_y)):
+            if round(self.steps_locations[self.iterations - 1][axis] * position[axis], 3) < 0:
+                crossed.append(crossed[-1] + 1)
+            elif round(self.steps_locations[self.iterations - 1][axis] * position[axis], 3) == 0:
+                i = 1
+                while round(self.steps_locations[self.iterations - i][axis] * position[axis], 3) == 0 and i < len(self.steps_locations) - 1:
+                    i += 1
+                if round(self.steps_locations[self.iterations - i][axis] * position[axis], 3) < 0:
+                    crossed.append(crossed[-1] + 1)
+                else:
+                    crossed.append(crossed[-1])
+            else:
+                crossed.append(crossed[-1])
+
+
+# Test that the constant time update records exactly the same statistics as the original one
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_update_matches_reference(seed):
+    rng = random.Random(seed)
+    stats = WalkerStats()
+    reference = ReferenceStats()
+    x, y = 0, 0
+    for i in range(3000):
+        # lattice moves make long runs along the axes
+        dx, dy = rng.choice([(10, 0), (-10, 0), (0, 10), (0, -10), (3, 0), (0, -7)])
+        x, y = x + dx, y + dy
+        if rng.random() < 0.05:
+            x, y = rng.choice([(0, 0), (x, 0), (0, y)])
+        stats.update((x, y))
+        reference.update((x, y))
+    for name in ['steps_locations', 'distance_from_center', 'distance_from_x', 'distance_from_y', 'radius_steps',
+                 'times_crossed_x', 'times_crossed_y']:
+        assert getattr(stats, name) == getattr(reference, name), "Mismatch in {}".format(name)
+    assert stats.iterations == reference.iterations
+
+
+# Test that compact storage records the same statistics as lists, in typed columns
+def test_compact_storage_matches_lists():
+    rng = random.Random(11)
+    stats = WalkerStats()
+    compact = WalkerStats('compact')
+    for i in range(5000):
+        position = (rng.randint(-300, 300), rng.randint(-300, 300))
+        stats.update(position)
+        compact.update(position)
+    assert compact.steps_locations.view().shape == (5001, 2)
+    assert [tuple(row) for row in compact.steps_locations.tolist()] == stats.steps_locations
+    for name in ['distance_from_x', 'distance_from_y', 'radius_steps', 'times_crossed_x', 'times_crossed_y']:
+        assert getattr(compact, name).tolist() == getattr(stats, name), "Mismatch in {}".format(name)
+    assert np.allclose(compact.distance_from_center, stats.distance_from_center)
+    assert compact.distance_from_center.dtype == np.float32
+    assert len(compact.radius_steps) == 5001 and compact.radius_steps[-1] == stats.radius_steps[-1]
+
+
+def test_growable_array_views():
+    column = GrowableArray(np.int32, capacity=2)
+    for i in range(10):
+        column.append(i)
+    assert len(column) == 10 and column.nbytes == 16 * 4
+    view = np.asarray(column)
+    assert view.base is not None and not view.flags.writeable
+    assert view.tolist() == list(range(10))
+    assert list(column) == list(range(10)) and column[-1] == 9
+
+
+# Test that disk storage records the same statistics as compact storage, in files that grow by chunks
+def test_disk_storage_matches_compact(tmp_path, monkeypatch):
+    monkeypatch.setattr(Stats, 'CHUNK_ROWS', 100)
+    rng = random.Random(12)
+    compact = WalkerStats('compact')
+    disk = WalkerStats('disk', directory=str(tmp_path))
+    for i in range(1234):
+        position = (rng.randint(-300, 300), rng.randint(-300, 300))
+        compact.update(position)
+        disk.update(position)
+    disk.flush()
+    for name in COLUMNS:
+        assert np.array_equal(np.asarray(getattr(disk, name)), np.asarray(getattr(compact, name)))
+    view = disk.steps_locations.view()
+    assert isinstance(view, np.memmap) and not view.flags.writeable
+    # the file grew by chunks, and the values are in it
+    path = str(tmp_path / 'radius_steps.bin')
+    assert os.path.getsize(path) == 1300 * 8
+    assert np.array_equal(np.fromfile(path, dtype=np.int64)[:len(compact.radius_steps)],
+                          np.asarray(compact.radius_steps))
+
+
+def test_disk_storage_temporary_directory():
+    stats = WalkerStats('disk')
+    stats.update((3, 4))
+    directory = stats.directory
+    assert os.path.exists(os.path.join(directory, 'steps_locations.bin'))
+    assert stats.distance_from_center[-1] == 5
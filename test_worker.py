@@ -0,0 +1,92 @@
+import pytest
+import threading
+import time
+import numpy as np
+import Ensemble
+import Worker
+from Cache import EnsembleCache
+from Walker import Walker
+from World import World
+
+
+class PollingApp:
+    """
+    Runs the callbacks of `after` in order, like the Tk main loop would
+    """
+    def __init__(self):
+        self.timers = []
+
+    def after(self, delay, callback, *args):
+        self.timers.append((callback, args))
+
+    def run_until(self, condition, timeout=30):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "timed out"
+            time.sleep(0.01)
+            timers, self.timers = self.timers, []
+            for callback, args in timers:
+                callback(*args)
+
+
+# Test that copies simulated by the worker give the same averages as copies simulated in place
+def test_copy_async_matches_copy():
+    app = PollingApp()
+    worker = Worker.SimulationWorker(app)
+    walker = Walker("Async", 2, "blue", False, world=World())
+    same = Walker("Async", 2, "blue", False, world=World(), seed=walker.seed)
+    for i in range(50):
+        walker.step()
+        same.step()
+
+    done = []
+    merged = []
+    walker.copy_async(600, worker, on_done=lambda: done.append(True), on_progress=merged.append,
+                      cache=EnsembleCache())
+    # the main loop is free while the copies are simulated
+    assert walker.copies == 1
+    app.run_until(lambda: done)
+    same.copy(600, cache=EnsembleCache())
+    assert walker.copies == 600 and merged[-1] == 599
+    # the same copies, merged in another order
+    for name in Ensemble.METRICS:
+        assert np.allclose(walker.averages.mean(name), same.averages.mean(name))
+        assert np.allclose(walker.averages.variance(name), same.averages.variance(name))
+    assert not worker.busy()
+
+
+# Test that a cancelled job stops early and never calls back
+def test_cancel_stops_job():
+    app = PollingApp()
+    worker = Worker.SimulationWorker(app)
+    started = threading.Event()
+    calls = []
+
+    def job(progress, cancelled):
+        started.set()
+        for i in range(1000):
+            if cancelled():
+                return 'stopped'
+            progress(i)
+            time.sleep(0.01)
+        return 'finished'
+
+    job_id = worker.submit(job, on_result=calls.append, on_progress=calls.append)
+    started.wait(5)
+    worker.cancel(job_id)
+    assert not worker.busy()
+    app.run_until(lambda: not worker.cancelled)
+    assert 'finished' not in calls and 'stopped' not in calls
+
+
+def test_errors_reach_the_main_loop():
+    app = PollingApp()
+    worker = Worker.SimulationWorker(app)
+    errors = []
+
+    def job(progress, cancelled):
+        raise ValueError('broken')
+
+    worker.submit(job, on_error=errors.append)
+    app.run_until(lambda: errors)
+    assert isinstance(errors[0], ValueError)
@@ -0,0 +1,115 @@
+import pytest
+import math
+import random
+import Seeds
+from Walker import Walker
+from World import World
+
+
+# Test that a walker steps without a Gui and never crosses a wall of its world
+def test_headless_walker_respects_walls():
+    world = World()
+    world.add_wall((-1000, 5, 1000, 5))
+    walker = Walker("Headless", 1, "blue", True, world=world, seed=Seeds.seed_sequence('walls'))
+    for i in range(200):
+        walker.step()
+        assert walker.lasty < 5
+    assert walker.stats.iterations == 200
+
+
+# Test that a walker stepping through a portal comes out next to its exit
+def test_headless_walker_teleports():
+    world = World()
+    world.add_portal(((-1000, 5), (1000, 5)), (500, 500))
+    walker = Walker("Headless", 3, "blue", False, world=world)
+    while walker.lasty < 400:
+        walker.lastx, walker.lasty = 0.0, 0.0
+        walker.step()
+    assert math.isclose(walker.lastx, 500, abs_tol=10) and math.isclose(walker.lasty, 500, abs_tol=10)
+
+
+def test_world_segments():
+    world = World()
+    assert not world.has_obstacles()
+    assert world.add_wall([1, 2, 3, 4], key=17) == 0
+    assert world.walls == [((1.0, 2.0), (3.0, 4.0))]
+    assert world.wall_keys == [17]
+    world.add_portal(((0, 0), (0, 10)), (5, 5))
+    assert world.portal_keys == [0]
+    assert world.has_obstacles()
+    world.clear()
+    assert not world.has_obstacles()
+
+
+# Test that the grid never misses a segment that a linear scan would find
+def test_segment_grid_matches_linear_scan():
+    rng = random.Random(7)
+    world = World()
+    walker = Walker("Scanner", 1, "blue", False, world=world)
+    for i in range(300):
+        x, y = rng.uniform(-500, 500), rng.uniform(-500, 500)
+        world.add_wall((x, y, x + rng.uniform(-300, 300), y + rng.uniform(-300, 300)))
+    for i in range(2000):
+        x, y = rng.uniform(-600, 600), rng.uniform(-600, 600)
+        line = ((x, y), walker.calculate_end_coordinates(x, y, rng.randint(0, 360), 15))
+        expected = [index for index, wall in enumerate(world.walls) if walker.intersects(wall, line)]
+        candidates = world.candidates('wall', line)
+        assert candidates == sorted(candidates)
+        assert set(expected) <= set(candidates)
+        assert walker.obstacle_intersection('wall', line) == (expected[0] if expected else None)
+
+
+# Test that a walker boxed in by walls neither recurses forever nor leaves the box
+@pytest.mark.parametrize("type", [1, 2, 3, 4])
+def test_boxed_in_walker(type):
+    world = World()
+    for wall in [(-3, -3, 3, -3), (3, -3, 3, 3), (3, 3, -3, 3), (-3, 3, -3, -3)]:
+        world.add_wall(wall)
+    walker = Walker("Boxed", type, "blue", False, chances=[0.25, 0.25, 0.25, 0.25, 0], world=world,
+                    seed=Seeds.seed_sequence('box'))
+    for i in range(100):
+        walker.step()
+    assert (walker.lastx, walker.lasty) == (0, 0)
+    assert walker.stuck_steps == 100
+    assert walker.stats.iterations == 100
+    assert walker.rejection_rate() == 1.0
+
+
+# Test that a walker in a corridor only takes the moves the walls allow
+def test_corridor_walker_uses_admissible_moves():
+    world = World()
+    world.add_wall((-1000, 5, 1000, 5))
+    world.add_wall((-1000, -5, 1000, -5))
+    walker = Walker("Corridor", 3, "blue", False, world=world, seed=Seeds.seed_sequence('corridor'))
+    for i in range(300):
+        walker.step()
+        assert math.isclose(walker.lasty, 0, abs_tol=1e-9)
+    assert walker.stuck_steps == 0
+    assert 0 < walker.rejection_rate() < 1
+
+
+# Test that a walker's path only depends on its own seed, however walkers are interleaved
+def test_walkers_have_independent_streams():
+    world = World()
+    world.add_wall((-30, 12, 30, 12))
+    alone = Walker("First", 2, "blue", False, world=world, seed=Seeds.seed_sequence('session', 'First'))
+    for i in range(200):
+        alone.step()
+
+    first = Walker("First", 2, "blue", False, world=world, seed=Seeds.seed_sequence('session', 'First'))
+    second = Walker("Second", 2, "blue", False, world=world, seed=Seeds.seed_sequence('session', 'Second'))
+    for i in range(200):
+        first.step()
+        second.step()
+        second.step()
+    assert first.stats.steps_locations == alone.stats.steps_locations
+    assert second.stats.steps_locations != first.stats.steps_locations
+
+
+# Test that bulk draws continue the same stream as single draws
+def test_draw_uniforms_continues_stream():
+    walker = Walker("Drawer", 1, "blue", False, seed=Seeds.seed_sequence(5))
+    singles = [walker.uniform() for i in range(1500)]
+    walker.reseed(Seeds.seed_sequence(5))
+    bulk = walker.draw_uniforms(10).tolist() + [walker.uniform() for i in range(1480)] + walker.draw_uniforms(10).tolist()
+    assert bulk == singles